@@ -1,25 +1,33 @@
-import pandas as pd
+import os
 import streamlit as st
-import datetime as dt
+from motor import agregacao, aquecimento, dados, esquema, externo, instrumentacao, memoria
 
-@st.cache_data
-def load_database():
-    df = pd.read_excel('data/ideb.xlsx')
-    df = df.drop(columns=['ddd','capital_uf'])
+# Base maior que a memória: pasta Parquet particionada por ano (ou a pasta de cache
+# da aplicação) consultada sob demanda; só as páginas de agregação a suportam
+EXTERNO = os.environ.get('IDEB_EXTERNO')
+EXTERNO_PAGINAS = ['Cubo', 'Dashboard', 'Visualização', 'Análise Descritiva']
+
+@st.cache_resource(max_entries=1)
+def load_database(versao):
+    # Converte o xlsx uma vez para partições Feather; depois as partições mapeadas são
+    # lidas numa única cópia em memória (uma conversão Arrow -> pandas, sem cópias por partição).
+    # Uma única base por processo, compartilhada (somente leitura) entre as sessões;
+    # uma nova edição ingerida muda a versão e reaproveita os agregados anteriores
+    df = dados.carregar_ideb()
+    agregacao.migrar(df)
     return df
 
+@st.cache_resource(max_entries=1)
+def load_externa(caminho, versao):
+    # Só os metadados do dataset ficam em memória
+    return externo.abrir(caminho)
+
 st.set_page_config(page_title="Gestão do Conhecimento", layout="wide")
-st.session_state['df'] = load_database()
-st.session_state['dimensao'] = [
-    'cidade', 'nome_uf','nome_regiao','rede','ensino','anos_escolares', 'nome_regiao_saude', 'nome_regiao_imediata', 'nome_regiao_intermediaria', 'nome_microrregiao', 'nome_mesorregiao','nome_regiao_metropolitana','nome_uf','nome_regiao','amazonia_legal'
-]
-st.session_state['dimensao_tempo'] = ['ano']
-st.session_state['medida'] = ['taxa_aprovacao', 'nota_saeb_matematica', 'nota_saeb_lingua_portuguesa','nota_saeb_media_padronizada', 'indicador_rendimento','ideb']
-st.session_state['agregador'] = ['sum', 'mean', 'count', 'min', 'max']
-st.title('Gestão do Conhecimento')
+# Medição de tempo, CPU, memória e carga enviada de cada bloco (desligada por padrão)
+depuracao = st.sidebar.toggle('Instrumentação', key='instrumentacao')
+instrumentacao.iniciar(depuracao)
 
-pg = st.navigation(
-    {
+paginas = {
         "Menu": [
             st.Page(page='tabela.py', title='Tabela', icon=':material/house:'),
             st.Page(page='cubo.py', title='Cubo', icon=':material/grid_on:'),
@@ -36,6 +44,62 @@ pg = st.navigation(
             st.Page(page='visualizacao/prescritiva.py', title='Análise Prescritiva',
                     icon=':material/house:'),
             ],
+}
+if EXTERNO:
+    # As demais páginas precisam da base inteira em memória
+    paginas = {
+        secao: [p for p in lista if p.title in EXTERNO_PAGINAS] for secao, lista in paginas.items()
     }
-)
-pg.run()
\ No newline at end of file
+pg = st.navigation(paginas)
+# Menu e título vão para o navegador antes da base ser carregada
+st.title('Gestão do Conhecimento')
+# Cópia rasa: com Copy-on-Write a sessão só paga pelas colunas que alterar
+with instrumentacao.medir('app.carregar_base') as medida, st.spinner('Carregando a base...'):
+    if EXTERNO:
+        base = load_externa(EXTERNO, externo.versao(EXTERNO))
+    else:
+        base = load_database(dados.versao_atual())
+    medida.linhas = len(base)
+st.session_state['df'] = base if EXTERNO else base.copy(deep=False)
+st.session_state['dimensao'] = list(esquema.DIMENSAO)
+st.session_state['dimensao_tempo'] = list(esquema.DIMENSAO_TEMPO)
+st.session_state['medida'] = list(esquema.MEDIDA)
+st.session_state['agregador'] = list(esquema.AGREGADOR)
+# Máximo de pontos enviados ao navegador em gráficos de dispersão
+st.session_state['limite_pontos'] = 20000
+
+if not EXTERNO and st.sidebar.toggle('Relatório de memória'):
+    relatorio = memoria.relatorio_sessao(st.session_state, base)
+    st.sidebar.metric('Base compartilhada (bytes)', relatorio['base_compartilhada'])
+    st.sidebar.metric('Antes, por sessão (bytes)', relatorio['antes_por_sessao'])
+    st.sidebar.metric('Agora, por sessão (bytes)', relatorio['agora_por_sessao'])
+    st.sidebar.dataframe(relatorio['detalhe'], hide_index=True)
+    tipos = memoria.relatorio_tipos(base)
+    st.sidebar.metric('Base sem otimização de tipos (bytes)', int(tipos['bytes_sem_otimizacao'].sum()))
+    st.sidebar.dataframe(tipos, hide_index=True)
+
+if st.sidebar.toggle('Cache de agregações'):
+    estatisticas = agregacao.cache.estatisticas()
+    st.sidebar.metric('Acertos', estatisticas['acertos'])
+    st.sidebar.metric('Falhas', estatisticas['falhas'])
+    st.sidebar.metric('Ocupação (bytes)', f"{estatisticas['bytes']} / {estatisticas['limite_bytes']}")
+
+with instrumentacao.medir(f'pagina {pg.title}'):
+    pg.run()
+# Com a primeira página já exibida, as bibliotecas e estruturas das demais páginas
+# são preparadas em segundo plano (uma vez por processo e versão da base)
+aquecimento.iniciar(base)
+
+if depuracao:
+    st.sidebar.subheader('Tempos desta execução')
+    st.sidebar.dataframe(
+        instrumentacao.tabela().drop(columns='inicio'), hide_index=True,
+        column_config={'segundos': st.column_config.NumberColumn(format='%.4f'),
+                       'cpu_segundos': st.column_config.NumberColumn(format='%.4f')}
+    )
+    st.sidebar.download_button(
+        'Exportar JSON lines', instrumentacao.jsonl(pg.title),
+        file_name='instrumentacao.jsonl', mime='application/jsonl'
+    )
+    if os.environ.get('IDEB_INSTRUMENTACAO'):
+        instrumentacao.exportar(os.environ['IDEB_INSTRUMENTACAO'], pg.title)
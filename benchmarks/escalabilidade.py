@@ -0,0 +1,58 @@
+# Escalabilidade do backend de agregação paralelo de 1 a N núcleos.
+#   python -m benchmarks.escalabilidade --linhas 5000000 --repeticoes 3
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from motor import execucao, sintetico
+
+CONSULTAS = [
+    (['nome_uf', 'rede'], 'mean'),
+    (['cidade', 'ano'], 'sum'),
+    (['cidade', 'rede', 'ensino'], 'max'),
+]
+
+
+def _tempo(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def medir(df, nucleos, repeticoes=3):
+    linhas = []
+    for grupos, agregador in CONSULTAS:
+        execucao.configurar('pandas', 1)
+        base = _tempo(lambda: execucao.agrupar(df, grupos, 'ideb', agregador), repeticoes)
+        for n in nucleos:
+            execucao.configurar('paralelo', n)
+            tempo = _tempo(lambda: execucao.agrupar(df, grupos, 'ideb', agregador), repeticoes)
+            linhas.append({
+                'consulta': f'{agregador}({",".join(grupos)})',
+                'nucleos': n,
+                'segundos': round(tempo, 4),
+                'aceleracao': round(base / tempo, 2),
+            })
+    return pd.DataFrame(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Escalabilidade do backend de agregação')
+    parser.add_argument('--linhas', type=int, default=5_000_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--max-nucleos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    nucleos = sorted({1, *[2 ** i for i in range(1, args.max_nucleos.bit_length())], args.max_nucleos})
+    execucao.LINHAS_MINIMAS = 0
+    resultado = medir(sintetico.base(args.linhas), nucleos, args.repeticoes)
+    print(resultado.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# Tempo de inicialização da aplicação, sem navegador.
+#   python -m benchmarks.inicializacao                       # na pasta que contém data/ideb.xlsx
+#   python -m benchmarks.inicializacao --pasta /srv/ideb --repeticoes 5 --saida partida.json
+# Perfil de importação: custo (python -X importtime) de cada import de app.py e das
+# páginas, além do que o próprio Streamlit já importa.
+# Partida a frio: cada repetição roda num processo novo (caches do Streamlit e do motor
+# vazios; o cache Feather da base em disco já existe) e executa app.py com o AppTest,
+# como a primeira sessão do servidor. Mede o tempo até a primeira página renderizada
+# e, depois dela, a abertura de cada página, com e sem o pré-aquecimento em segundo plano.
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = 'app.py'
+PAGINAS = [
+    'tabela.py', 'cubo.py', 'dashboard.py', 'visualizacao.py',
+    'visualizacao/descritiva.py', 'visualizacao/diagnostica.py',
+    'visualizacao/preditiva.py', 'visualizacao/prescritiva.py',
+]
+# Já importados pelo Streamlit (ou por qualquer página) antes do código da aplicação
+COMUNS = ['streamlit', 'pandas']
+
+
+def _importacoes(script):
+    # Comandos import do nível superior do script, na ordem em que aparecem
+    with open(os.path.join(RAIZ, script), encoding='utf-8') as arquivo:
+        arvore = ast.parse(arquivo.read())
+    return [ast.unparse(no) for no in arvore.body if isinstance(no, (ast.Import, ast.ImportFrom))]
+
+
+def _importtime(codigo):
+    # Entradas (módulo, segundos acumulados) de nível superior do -X importtime
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stderr
+    entradas = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        if not nome.startswith('  '):
+            entradas.append((nome.strip(), int(acumulado) / 1e6))
+    return entradas
+
+
+def perfil_importacao(scripts=None):
+    # Uma linha por script: segundos de importação além dos módulos comuns e os imports mais caros
+    linhas = []
+    for script in scripts or [APP] + PAGINAS:
+        comandos = [c for c in _importacoes(script) if c.split()[1].split('.')[0] not in COMUNS]
+        codigo = '\n'.join([f'import {m}' for m in COMUNS] + [
+            # Dependência ausente não interrompe o perfil das demais
+            f'try:\n    {c}\nexcept ImportError:\n    pass' for c in comandos
+        ])
+        entradas = _importtime(codigo)
+        inicio = max(i for i, (nome, _) in enumerate(entradas) if nome in COMUNS) + 1
+        proprias = sorted(entradas[inicio:], key=lambda e: -e[1])
+        linhas.append({
+            'script': script,
+            'segundos': round(sum(s for _, s in proprias), 4),
+            'mais_pesados': ', '.join(f'{nome} ({s:.3f}s)' for nome, s in proprias[:3]),
+        })
+    return pd.DataFrame(linhas)
+
+
+def _sessao(paginas, preaquecer):
+    # Executado no processo filho: primeira execução de app.py e depois cada página
+    marcas = {'inicio': time.time()}
+    from streamlit.testing.v1 import AppTest
+    marcas['streamlit'] = time.time()
+    sessao = AppTest.from_file(os.path.join(RAIZ, APP), default_timeout=600)
+    sessao.run()
+    marcas['primeira_renderizacao'] = time.time()
+    erros = len(sessao.exception)
+    if preaquecer:
+        from motor import aquecimento
+        aquecimento.aguardar()
+    marcas['aquecimento'] = time.time()
+    aberturas = {}
+    for pagina in paginas:
+        inicio = time.perf_counter()
+        sessao.switch_page(pagina).run()
+        aberturas[pagina] = time.perf_counter() - inicio
+        erros += len(sessao.exception)
+    print(json.dumps({'marcas': marcas, 'paginas': aberturas, 'erros': erros}))
+
+
+def partida(pasta, paginas, preaquecer, timeout=1200):
+    # Um processo novo por medida; os tempos de processo são contados a partir do spawn
+    ambiente = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join([RAIZ, os.environ.get('PYTHONPATH', '')]),
+        'IDEB_PREAQUECER': '1' if preaquecer else '0',
+    }
+    codigo = f'from benchmarks.inicializacao import _sessao; _sessao({paginas!r}, {preaquecer!r})'
+    spawn = time.time()
+    saida = subprocess.run(
+        [sys.executable, '-c', codigo], cwd=pasta, env=ambiente,
+        capture_output=True, text=True, check=True, timeout=timeout,
+    ).stdout
+    resultado = json.loads(saida.strip().splitlines()[-1])
+    marcas = resultado['marcas']
+    return {
+        'interpretador': marcas['inicio'] - spawn,
+        'importacao_streamlit': marcas['streamlit'] - marcas['inicio'],
+        'primeira_renderizacao': marcas['primeira_renderizacao'] - spawn,
+        'aquecimento': marcas['aquecimento'] - marcas['primeira_renderizacao'],
+        **{f'abrir {p}': s for p, s in resultado['paginas'].items()},
+        'erros': resultado['erros'],
+    }
+
+
+def comparar_partidas(pasta, paginas, repeticoes=3):
+    # Melhor de `repeticoes` processos para cada modo
+    linhas = []
+    for preaquecer in (False, True):
+        medidas = pd.DataFrame([partida(pasta, paginas, preaquecer) for _ in range(repeticoes)])
+        linhas.append({'preaquecer': preaquecer, **medidas.min().round(4).to_dict()})
+        print(linhas[-1], file=sys.stderr)
+    return pd.DataFrame(linhas).set_index('preaquecer').T
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da inicialização da aplicação')
+    parser.add_argument('--pasta', default='.', help='pasta de trabalho da aplicação (com data/ideb.xlsx)')
+    parser.add_argument('--paginas', nargs='+', default=[p for p in PAGINAS if p != 'tabela.py'])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-partida', action='store_true', help='só o perfil de importação')
+    parser.add_argument('--saida', help='grava os resultados em JSON')
+    args = parser.parse_args()
+
+    perfil = perfil_importacao()
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 120):
+        print(perfil.to_string(index=False))
+    resultados = {'importacao': perfil.to_dict('records')}
+    if not args.sem_partida:
+        partidas = comparar_partidas(os.path.abspath(args.pasta), args.paginas, args.repeticoes)
+        print(partidas.to_string())
+        resultados['partida'] = {str(modo): valores for modo, valores in partidas.to_dict().items()}
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# Benchmark dos cálculos principais de cada página, sem navegador.
+#   python -m benchmarks.paginas                          # compara com a linha de base
+#   python -m benchmarks.paginas --linhas 10000 100000 --gravar
+# Para cada página e tamanho de base mede a latência (cache frio), o pico de
+# memória alocada (tracemalloc) e o tamanho da carga que seria enviada ao navegador.
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from motor import agregacao, estatistica, indice, instrumentacao, modelos, olap, prescricao, render, sintetico
+
+LINHA_DE_BASE = os.path.join(os.path.dirname(__file__), 'linha_de_base.json')
+TAMANHOS = [10_000, 100_000, 1_000_000, 10_000_000]
+# Razão a partir da qual uma medida é considerada regressão
+TOLERANCIA = 1.2
+# Latências abaixo disso oscilam demais para acusar regressão
+SEGUNDOS_MINIMOS = 0.05
+
+
+def cubo(df):
+    return agregacao.pivotar(df, ['nome_uf'], ['rede'], 'ideb', 'mean', fill_value=0, cubo=olap.cubo_para(df))
+
+
+def descritiva_sankey(df):
+    colunas = ['nome_regiao', 'nome_uf', 'rede']
+    grupo = agregacao.agregar(df, colunas, 'ideb').reset_index()
+    rotulos, ligacoes = render.sankey(grupo, colunas, 'ideb')
+    return {'rotulos': list(rotulos), 'ligacoes': ligacoes.to_dict('list')}
+
+
+def descritiva_serie(df):
+    return agregacao.pivotar(df, ['ano'], ['nome_regiao', 'rede'], 'ideb', 'sum').reset_index()
+
+
+def diagnostica(df):
+    ano = int(df['ano'].max())
+    tukey, _, _ = estatistica.tukey(df, 'cidade', 'ideb', ano)
+    indicador = estatistica.indice_temporal(df, 'nome_uf', 'ideb')
+    membro = indicador['valores'].index[0]
+    evolucao = estatistica.serie(indicador, membro).reset_index()
+    evolucao['classe'] = estatistica.classificar(evolucao.iloc[:, 1], indicador['resumo'].loc[membro])
+    return {'tukey': tukey, 'evolucao': evolucao}
+
+
+def _treinar(tipo, parametros, X, y=None):
+    # No próprio processo, para que tempo e memória do treino entrem na medida
+    with tempfile.TemporaryDirectory() as pasta:
+        return modelos._treinar(tipo, parametros, X, y, os.path.join(pasta, 'modelo.joblib'))
+
+
+def preditiva(df):
+    atributos = ['taxa_aprovacao', 'nota_saeb_matematica', 'rede']
+    base = df[atributos + ['ideb']].dropna()
+    X = base[atributos].assign(rede=base['rede'].cat.codes)
+    linear = _treinar('linear', {}, X, base['ideb'])
+    grupos = _treinar('kmeans_lote', {'random_state': 42, 'n_init': 3, 'batch_size': 4096, 'n_clusters': 5}, X)
+    return {'mse': linear['mse'], 'inercia': grupos['inercia'], 'amostra': render.amostrar(base, atributos, 20000)}
+
+
+def prescritiva(df):
+    notas = ['nota_saeb_matematica', 'nota_saeb_lingua_portuguesa', 'taxa_aprovacao']
+    solucao = prescricao.alocar(df, ['cidade'], notas, 'nota_saeb_media_padronizada', 1.0, 50000, 'registros')
+    return prescricao.tabela(solucao)
+
+
+CASOS = {
+    'cubo': cubo,
+    'descritiva_sankey': descritiva_sankey,
+    'descritiva_serie': descritiva_serie,
+    'diagnostica': diagnostica,
+    'preditiva': preditiva,
+    'prescritiva': prescritiva,
+}
+
+
+def _limpar_caches():
+    # Cada medida parte do cache frio, como na primeira visita à página
+    agregacao.cache.limpar()
+    modelos.resultados.limpar()
+    olap._cubos.clear()
+    indice._indices.clear()
+    gc.collect()
+
+
+def medir(nome, df, repeticoes=3):
+    caso = CASOS[nome]
+    tempos = []
+    for _ in range(repeticoes):
+        _limpar_caches()
+        inicio = time.perf_counter()
+        valor = caso(df)
+        tempos.append(time.perf_counter() - inicio)
+
+    # Memória medida numa execução à parte: o tracemalloc deixa o código mais lento
+    _limpar_caches()
+    tracemalloc.start()
+    caso(df)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'segundos': min(tempos), 'pico_bytes': pico, 'carga_bytes': instrumentacao.tamanho_carga(valor)}
+
+
+def executar(tamanhos, casos, repeticoes=3, semente=0):
+    resultados = {}
+    for linhas in tamanhos:
+        df = sintetico.base(linhas, semente)
+        for nome in casos:
+            resultados[f'{nome}@{linhas}'] = medir(nome, df, repeticoes)
+            print(f'{nome}@{linhas}', resultados[f'{nome}@{linhas}'], file=sys.stderr)
+        del df
+    return resultados
+
+
+def comparar(resultados, base, tolerancia=TOLERANCIA):
+    # Razão entre a medida atual e a linha de base; acima da tolerância é regressão
+    linhas = []
+    for chave, atual in resultados.items():
+        anterior = base.get(chave, {})
+        for medida, valor in atual.items():
+            razao = valor / anterior[medida] if anterior.get(medida) else None
+            linhas.append({
+                'caso': chave, 'medida': medida, 'atual': valor, 'base': anterior.get(medida),
+                'razao': round(razao, 2) if razao is not None else None,
+                'regressao': razao is not None and razao > tolerancia
+                and not (medida == 'segundos' and valor < SEGUNDOS_MINIMOS),
+            })
+    return pd.DataFrame(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das páginas da aplicação')
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS)
+    parser.add_argument('--casos', nargs='+', default=list(CASOS), choices=list(CASOS))
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--base', default=LINHA_DE_BASE)
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--gravar', action='store_true', help='grava os resultados como nova linha de base')
+    args = parser.parse_args()
+
+    resultados = executar(args.linhas, args.casos, args.repeticoes)
+    if args.gravar:
+        with open(args.base, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, sort_keys=True)
+        print(f'Linha de base gravada em {args.base}')
+        return 0
+
+    try:
+        with open(args.base, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+    except FileNotFoundError:
+        base = {}
+    tabela = comparar(resultados, base, args.tolerancia)
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(tabela.to_string(index=False))
+    # Código de saída diferente de zero quando há regressão (para uso na integração contínua)
+    return 1 if tabela['regressao'].any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,14 @@
 import pandas as pd
 import streamlit as st
+from motor import agregacao, exportacao, olap, pivo
+from motor.instrumentacao import exibir
+
+
+@st.cache_resource(max_entries=2)
+def load_cubo(_df, versao):
+    # Agregados materializados uma vez por versão da base
+    return olap.cubo_para(_df)
+
 
 cols = st.columns(4)
 linhas = cols[0].multiselect(
@@ -19,15 +28,57 @@ agg = cols[3].selectbox(
     st.session_state['agregador']
 )
 if (len(linhas) > 0) & (len(colunas) > 0) & (linhas != colunas):
-    st.dataframe(
-        st.session_state['df'].pivot_table(
-            index=linhas,
-            columns=colunas,
-            values=valor,
-            aggfunc=agg,
-            fill_value=0
+    # Bases fora da memória agregam direto do dataset, sem cubo materializado
+    cubo = load_cubo(st.session_state['df'], st.session_state['df'].attrs.get('versao')) \
+        if isinstance(st.session_state['df'], pd.DataFrame) else None
+    df = st.session_state['df']
+    # Tamanho estimado pelos membros das dimensões antes de agregar qualquer coisa
+    estimativa = pivo.estimar(df, linhas, colunas)
+    st.caption(
+        f"Até {estimativa['linhas']} linhas x {estimativa['colunas']} colunas "
+        f"({estimativa['celulas']} células, no máximo {estimativa['grupos']} não vazias)"
+    )
+    tamanho = 100
+    if estimativa['densa']:
+        tabela = agregacao.pivotar(df, linhas, colunas, valor, agg, fill_value=0, cubo=cubo)
+        exibir('cubo.pivot', st.dataframe, tabela)
+    else:
+        st.warning('Pivô grande demais para exibir inteiro: escolha os principais membros ou o formato longo.')
+        formato = st.radio('Exibição', ['Principais + Outros', 'Formato longo'], horizontal=True)
+        cols = st.columns(3)
+        if formato == 'Principais + Outros':
+            n_colunas = cols[1].number_input(
+                'Colunas principais', min_value=1, max_value=200, value=max(1, min(20, estimativa['colunas']))
+            )
+            n_linhas = cols[0].number_input(
+                'Linhas principais', min_value=1,
+                max_value=max(1, pivo.LIMITE_CELULAS // (n_colunas + 1) - 1), value=50
+            )
+            tabela = pivo.principais(df, linhas, colunas, valor, agg, n_linhas, n_colunas, cubo=cubo)
+        else:
+            tabela = pivo.longo(df, linhas, colunas, valor, agg, cubo=cubo)
+        numero = cols[2].number_input(
+            'Página', min_value=1, max_value=pivo.paginas(len(tabela), tamanho), value=1
+        )
+        st.text(f'{len(tabela)} linhas em {pivo.paginas(len(tabela), tamanho)} páginas')
+        exibir(
+            'cubo.pivot', st.dataframe, pivo.pagina(tabela, numero, tamanho),
+            hide_index=formato == 'Formato longo'
         )
+    # O agregado por linha também é limitado no que vai para o navegador
+    agregado = agregacao.agregar(df, linhas, valor, 'sum', cubo=cubo).reset_index()
+    exibir('cubo.agregado', st.dataframe, pivo.pagina(agregado, 1, pivo.LIMITE_CELULAS))
+
+    # Exportação completa (não só a página exibida), montada em memória quando o botão é clicado:
+    # o pivô e o agregado têm no máximo um grupo por combinação de membros, não as linhas da base
+    cols = st.columns(4)
+    saida = cols[0].selectbox('Formato', list(exportacao.FORMATOS), key='cubo_formato')
+    compactar = cols[1].toggle('Compactar (gzip)', value=True, disabled=saida != 'csv') and saida == 'csv'
+    cols[2].download_button(
+        'Exportar pivô', lambda: exportacao.exportar(exportacao.blocos(exportacao.plano(tabela)), saida, compactar),
+        file_name=exportacao.nome_arquivo('cubo', saida, compactar), mime=exportacao.mime(saida, compactar)
     )
-    st.dataframe(
-        st.session_state['df'].groupby(linhas)[valor].sum().reset_index()
+    cols[3].download_button(
+        'Exportar agregado', lambda: exportacao.exportar(exportacao.blocos(agregado), saida, compactar),
+        file_name=exportacao.nome_arquivo('agregado', saida, compactar), mime=exportacao.mime(saida, compactar)
     )
@@ -1,12 +1,26 @@
 import streamlit as st
-from pygwalker.api.streamlit import StreamlitRenderer
-import pygwalker as pyg
-
-pyg_app = StreamlitRenderer(
-    st.session_state['df'][
-        st.session_state['dimensao'] +
-        st.session_state['dimensao_tempo'] +
-        st.session_state['medida']
-    ]
-)
-pyg_app.explorer()
\ No newline at end of file
+from motor import painel
+from motor.instrumentacao import medir
+
+
+@st.cache_resource(max_entries=len(painel.GRANULARIDADES))
+def load_renderer(_df, versao, granularidade):
+    # Um renderizador por versão da base e granularidade, compartilhado entre as sessões.
+    # Com kernel_computation as consultas do explorador rodam no servidor (DuckDB)
+    # e o navegador recebe só o resultado de cada gráfico, não a tabela.
+    # Somente leitura: uma sessão não grava a configuração que as outras abrem.
+    from pygwalker.api.streamlit import StreamlitRenderer
+
+    return StreamlitRenderer(
+        painel.tabela(_df, granularidade), kernel_computation=True,
+        spec=painel.spec(versao, granularidade), spec_io_mode='r',
+    )
+
+
+df = st.session_state['df']
+rotulo = st.radio('Granularidade', list(painel.GRANULARIDADES), horizontal=True)
+granularidade = painel.GRANULARIDADES[rotulo]
+pyg_app = load_renderer(df, df.attrs.get('versao'), granularidade)
+st.caption('Médias por grupo; a coluna `<medida>_n` traz o número de registros de cada média.')
+with medir('dashboard.explorer'):
+    pyg_app.explorer()
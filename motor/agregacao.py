@@ -0,0 +1,234 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from motor import execucao
+from motor.externo import BaseExterna
+from motor.instrumentacao import medido
+from motor.indice import indice_para
+
+# Limite de memória ocupada pelos resultados guardados no cache
+LIMITE_BYTES = 256 * 1024 * 1024
+
+
+def _tamanho(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sum(_tamanho(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    # Cache LRU compartilhado por todas as sessões, com despejo por tamanho em bytes
+    def __init__(self, limite_bytes=LIMITE_BYTES):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, calcular):
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+
+        valor = calcular()
+        self.guardar(chave, valor)
+        return valor
+
+    def consultar(self, chave):
+        # Só consulta, sem calcular: None quando a chave não está no cache
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+            return None
+
+    def guardar(self, chave, valor):
+        tamanho = _tamanho(valor)
+        with self._trava:
+            if chave not in self._itens and tamanho <= self.limite_bytes:
+                self._itens[chave] = (valor, tamanho)
+                self.bytes += tamanho
+                while self.bytes > self.limite_bytes:
+                    _, (_, liberado) = self._itens.popitem(last=False)
+                    self.bytes -= liberado
+
+    def itens(self):
+        with self._trava:
+            return [(chave, valor) for chave, (valor, _) in self._itens.items()]
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        with self._trava:
+            total = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+                'itens': len(self._itens),
+                'bytes': self.bytes,
+                'limite_bytes': self.limite_bytes,
+            }
+
+
+cache = CacheLRU()
+
+
+def _lista(valores):
+    if isinstance(valores, (list, tuple, set, pd.Index, pd.Series)):
+        return list(valores)
+    return [valores]
+
+
+def _chave_filtros(filtros):
+    if not filtros:
+        return ()
+    return tuple(sorted(
+        (coluna, tuple(sorted(_lista(valores), key=str))) for coluna, valores in filtros.items()
+    ))
+
+
+def _indice(df, filtros):
+    indice = indice_para(df)
+    if indice is not None and all(indice.indexavel(coluna) for coluna in filtros):
+        return indice
+    return None
+
+
+def linhas(df, filtros):
+    # Posições (iloc, crescentes) das linhas que passam nos filtros
+    indice = _indice(df, filtros)
+    if indice is None:
+        return np.flatnonzero(mascara(df, filtros))
+    # Combinações de filtros repetidas entre execuções saem do cache
+    return _memorizar(
+        df, ('linhas', len(df), _chave_filtros(filtros)),
+        lambda: indice.linhas({coluna: _lista(valores) for coluna, valores in filtros.items()}),
+        filtros,
+    )
+
+
+def mascara(df, filtros):
+    # filtros: {coluna: valor ou lista de valores}
+    indice = _indice(df, filtros)
+    if indice is not None:
+        selecionadas = np.zeros(len(df), dtype=bool)
+        selecionadas[linhas(df, filtros)] = True
+        return selecionadas
+    selecionadas = np.ones(len(df), dtype=bool)
+    for coluna, valores in filtros.items():
+        valores = _lista(valores)
+        if len(valores) == 1:
+            selecionadas &= (df[coluna] == valores[0]).to_numpy(dtype=bool, na_value=False)
+        else:
+            selecionadas &= df[coluna].isin(valores).to_numpy(dtype=bool)
+    return selecionadas
+
+
+def filtrar(df, filtros=None):
+    if not filtros:
+        return df
+    return df.take(linhas(df, filtros))
+
+
+def _versao(df, filtros):
+    # Consultas restritas a algumas edições dependem só das partições desses anos
+    particoes = df.attrs.get('particoes')
+    if filtros and 'ano' in filtros and particoes:
+        tokens = [particoes.get(ano) for ano in _lista(filtros['ano'])]
+        if all(tokens):
+            return ('particoes',) + tuple(sorted(tokens))
+    return df.attrs.get('versao')
+
+
+def _memorizar(df, chave, calcular, filtros=None):
+    versao = _versao(df, filtros)
+    if versao is None:
+        # Sem versão não há como invalidar: calcula sem guardar
+        return calcular()
+    valor = cache.obter((versao,) + chave, calcular)
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        # Cópia rasa para que a página possa acrescentar colunas sem alterar o cache
+        return valor.copy(deep=False)
+    return valor
+
+
+@medido()
+def agregar(df, grupos, medida, agregador='sum', filtros=None, cubo=None):
+    # Equivalente a df[filtros].groupby(grupos)[medida].agg(agregador), memorizado
+    grupos = _lista(grupos)
+
+    def calcular():
+        if isinstance(df, BaseExterna):
+            # Fora da memória: a agregação é feita na leitura do dataset
+            return df.agrupar(grupos, medida, agregador, {c: _lista(v) for c, v in (filtros or {}).items()})
+        if cubo is not None and not filtros and grupos:
+            return cubo.consultar(grupos, medida, agregador)
+        base = filtrar(df, filtros)
+        if not grupos:
+            return base[medida].agg(agregador)
+        return execucao.agrupar(base, grupos, medida, agregador)
+
+    chave = ('agregar', _chave_filtros(filtros), tuple(grupos), medida, agregador)
+    return _memorizar(df, chave, calcular, filtros)
+
+
+@medido()
+def pivotar(df, linhas, colunas, medida, agregador='sum', filtros=None, fill_value=None, cubo=None):
+    # Equivalente a pivot_table(index=linhas, columns=colunas, values=medida, aggfunc=agregador)
+    linhas, colunas = _lista(linhas), _lista(colunas)
+
+    def calcular():
+        resultado = agregar(df, linhas + colunas, medida, agregador, filtros, cubo)
+        if not colunas:
+            tabela = resultado.to_frame()
+        else:
+            tabela = resultado.unstack(list(range(len(linhas), len(linhas) + len(colunas))))
+        if fill_value is not None:
+            tabela = tabela.fillna(fill_value)
+        return tabela
+
+    chave = ('pivotar', _chave_filtros(filtros), tuple(linhas), tuple(colunas), medida, agregador, fill_value)
+    return _memorizar(df, chave, calcular, filtros)
+
+
+def migrar(df):
+    # Depois da ingestão de novas edições, reaproveita os agregados da versão anterior
+    # que agrupam por ano: só as linhas das edições novas são calculadas e acrescentadas.
+    anterior, anos = df.attrs.get('versao_anterior'), df.attrs.get('anos_novos')
+    if anterior is None or not anos:
+        return 0
+    candidatos = [
+        (chave, valor) for chave, valor in cache.itens()
+        if chave[0] == anterior and chave[1] == 'agregar'
+    ]
+    migrados = 0
+    for (_, _, filtros, grupos, medida, agregador), valor in candidatos:
+        filtros = dict(filtros)
+        if 'ano' not in grupos or 'ano' in filtros or not isinstance(valor, pd.Series):
+            continue
+        novos = filtrar(df, {**filtros, 'ano': anos}).groupby(list(grupos), observed=True)[medida].agg(agregador)
+        antigos = valor[~valor.index.get_level_values('ano').isin(anos)]
+        resultado = pd.concat([antigos, novos]).sort_index()
+        cache.guardar((df.attrs['versao'], 'agregar', _chave_filtros(filtros), grupos, medida, agregador), resultado)
+        migrados += 1
+    return migrados
@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from motor import (
+    agregacao, dados, esquema, estatistica, exportacao, externo, modelos, olap, paginacao, pivo, prescricao,
+)
+
+# API HTTP/JSON sobre o mesmo motor das páginas, sem Streamlit:
+#   python -m motor.api --porta 8000
+# Um processo atende todas as consultas: a base (lida das partições Feather, ou o
+# dataset externo de IDEB_EXTERNO) é carregada uma vez e o cache de agregações é
+# o mesmo para todas as requisições. O cálculo roda no pool de threads do servidor,
+# de modo que o laço assíncrono continua aceitando conexões durante as consultas.
+EXTERNO = os.environ.get('IDEB_EXTERNO')
+# Linhas por página nas respostas tabulares
+TAMANHO_PAGINA = 1_000
+
+_base = {'df': None, 'cubo': None}
+_trava = threading.Lock()
+
+
+def base():
+    # Recarregada só quando a versão muda (xlsx alterado ou nova edição ingerida)
+    versao = externo.versao(EXTERNO) if EXTERNO else dados.versao_atual()
+    with _trava:
+        atual = _base['df']
+        if atual is None or versao is None or atual.attrs.get('versao') != versao:
+            if EXTERNO:
+                df, cubo = externo.abrir(EXTERNO), None
+            else:
+                df = dados.carregar_ideb()
+                agregacao.migrar(df)
+                cubo = olap.cubo_para(df)
+            _base.update(df=df, cubo=cubo)
+        return _base['df'], _base['cubo']
+
+
+def _valor(coluna, texto):
+    # Valores de filtro chegam como texto: convertidos pelo tipo da coluna no esquema.
+    # Medidas no mesmo float32 da base, para que 5.1 encontre os valores gravados como 5.1
+    try:
+        if coluna in esquema.INTEIRAS:
+            return int(texto)
+        if coluna in esquema.MEDIDA:
+            return np.dtype(esquema.TIPO_MEDIDA).type(texto)
+    except ValueError:
+        raise ValueError(f'Valor inválido para {coluna}: {texto!r}') from None
+    if coluna in esquema.BOOLEANAS:
+        return texto.lower() in ('1', 'true', 'sim')
+    return texto
+
+
+def filtros(parametros):
+    # filtro=sigla_uf:SP,RJ&filtro=ano:2019,2021
+    resultado = {}
+    for termo in parametros.getlist('filtro'):
+        coluna, _, valores = termo.partition(':')
+        valores = [v for v in valores.split(',') if v]
+        if not coluna or not valores:
+            # Lista vazia não seleciona nada (e seria IN () no DuckDB): é erro do pedido
+            raise ValueError(f'Filtro inválido: {termo}')
+        resultado.setdefault(coluna, []).extend(_valor(coluna, v) for v in valores)
+    return resultado
+
+
+def _obrigatorio(parametros, nome):
+    if nome not in parametros:
+        raise ValueError(f'Parâmetro obrigatório: {nome}')
+    return parametros[nome]
+
+
+def _lista(parametros, nome):
+    # Aceita nome=a&nome=b ou nome=a,b
+    return [v for termo in parametros.getlist(nome) for v in termo.split(',') if v]
+
+
+def _inteiro(parametros, nome, padrao):
+    return int(parametros.get(nome, padrao))
+
+
+def _json(valor):
+    # Tipos do numpy e do pandas para JSON
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return _tabela(valor)
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, float) and np.isnan(valor):
+        return None
+    if isinstance(valor, dict):
+        return {str(c): _json(v) for c, v in valor.items()}
+    return valor
+
+
+def _tabela(tabela, numero=1, tamanho=None):
+    # Tabela plana (índice vira coluna) paginada: {'colunas', 'dados', 'linhas', 'paginas'}
+    if isinstance(tabela, pd.Series):
+        tabela = tabela.to_frame()
+    tabela = exportacao.plano(tabela)
+    total = len(tabela)
+    if tamanho:
+        tabela = pivo.pagina(tabela, numero, tamanho)
+    dividida = json.loads(tabela.to_json(orient='split', index=False, date_format='iso'))
+    return {
+        'colunas': dividida['columns'],
+        'dados': dividida['data'],
+        'linhas': total,
+        'paginas': pivo.paginas(total, tamanho) if tamanho else 1,
+    }
+
+
+def _pagina(parametros):
+    return _inteiro(parametros, 'pagina', 1), _inteiro(parametros, 'tamanho', TAMANHO_PAGINA)
+
+
+def _responder(funcao):
+    # Cada rota calcula no pool de threads; erros de parâmetro viram 400
+    async def rota(requisicao):
+        try:
+            corpo = await requisicao.json() if requisicao.method == 'POST' else None
+            return await run_in_threadpool(funcao, requisicao, corpo)
+        except (KeyError, ValueError, TypeError) as erro:
+            return JSONResponse({'erro': str(erro)}, status_code=400)
+    return rota
+
+
+def saude(requisicao, corpo):
+    df, _ = base()
+    return JSONResponse({'versao': df.attrs.get('versao'), 'linhas': len(df), 'externo': bool(EXTERNO)})
+
+
+def consultar_esquema(requisicao, corpo):
+    df, _ = base()
+    return JSONResponse({
+        'dimensoes': esquema.dimensoes(),
+        'dimensao_tempo': esquema.DIMENSAO_TEMPO,
+        'medidas': esquema.MEDIDA,
+        'agregadores': esquema.AGREGADOR,
+        'colunas': list(df.columns),
+    })
+
+
+def membros(requisicao, corpo):
+    # Membros de uma coluna, na ordem da base
+    df, _ = base()
+    coluna = requisicao.path_params['coluna']
+    contagem = agregacao.agregar(df, [coluna], coluna, 'count')
+    return JSONResponse({'coluna': coluna, 'membros': _json(contagem.index.to_numpy())})
+
+
+def agregar(requisicao, corpo):
+    # /agregar?grupos=nome_uf&grupos=ano&medida=ideb&agregador=mean&filtro=rede:estadual
+    parametros = requisicao.query_params
+    df, cubo = base()
+    resultado = agregacao.agregar(
+        df, _lista(parametros, 'grupos'), _obrigatorio(parametros, 'medida'),
+        parametros.get('agregador', 'sum'), filtros(parametros), cubo=cubo,
+    )
+    if not isinstance(resultado, pd.Series):
+        return JSONResponse({'valor': _json(resultado)})
+    return JSONResponse(_tabela(resultado, *_pagina(parametros)))
+
+
+def pivotar(requisicao, corpo):
+    # formato=denso (padrão), principais (top-N + Outros) ou longo. O pivô denso
+    # só é montado quando cabe em pivo.LIMITE_CELULAS; acima disso a resposta é 413.
+    parametros = requisicao.query_params
+    df, cubo = base()
+    linhas, colunas = _lista(parametros, 'linhas'), _lista(parametros, 'colunas')
+    medida, agregador = _obrigatorio(parametros, 'medida'), parametros.get('agregador', 'sum')
+    formato = parametros.get('formato', 'denso')
+    filtrado = filtros(parametros)
+    estimativa = pivo.estimar(df, linhas, colunas)
+    if formato == 'denso':
+        if not estimativa['densa']:
+            return JSONResponse(
+                {'erro': 'Pivô grande demais: use formato=principais ou formato=longo', 'estimativa': estimativa},
+                status_code=413,
+            )
+        tabela = agregacao.pivotar(df, linhas, colunas, medida, agregador, filtrado, fill_value=0, cubo=cubo)
+    elif formato == 'principais':
+        if filtrado:
+            raise ValueError('formato=principais não aceita filtros')
+        tabela = pivo.principais(
+            df, linhas, colunas, medida, agregador,
+            _inteiro(parametros, 'n_linhas', 50), _inteiro(parametros, 'n_colunas', 20), cubo=cubo,
+        )
+    elif formato == 'longo':
+        tabela = agregacao.agregar(df, linhas + colunas, medida, agregador, filtrado, cubo=cubo).reset_index()
+    else:
+        raise ValueError(f'Formato desconhecido: {formato}')
+    return JSONResponse({**_tabela(tabela, *_pagina(parametros)), 'estimativa': estimativa})
+
+
+def serie(requisicao, corpo):
+    # Série anual de cada membro e o resumo usado nos indicadores; membro= limita a um
+    parametros = requisicao.query_params
+    df, _ = base()
+    coluna = _obrigatorio(parametros, 'coluna')
+    indice = estatistica.indice_temporal(df, coluna, _obrigatorio(parametros, 'medida'))
+    valores, resumo = indice['valores'], indice['resumo']
+    if 'membro' in parametros:
+        membro = _valor(coluna, parametros['membro'])
+        # Comparação com o índice: .loc[[True]] seria lido como máscara booleana
+        valores, resumo = valores[valores.index == membro], resumo[resumo.index == membro]
+        if valores.empty:
+            raise KeyError(f'Membro inexistente: {membro}')
+    pagina = _pagina(parametros)
+    return JSONResponse({
+        'valores': _tabela(valores, *pagina),
+        'resumo': _tabela(resumo, *pagina),
+        'total': _tabela(indice['total']),
+    })
+
+
+def tukey(requisicao, corpo):
+    parametros = requisicao.query_params
+    df, _ = base()
+    tabela, pares, rejeitados = estatistica.tukey(
+        df, _obrigatorio(parametros, 'coluna'), _obrigatorio(parametros, 'medida'),
+        int(_obrigatorio(parametros, 'ano')), float(parametros.get('alpha', 0.05)),
+        parametros.get('apenas_rejeitados', 'true').lower() != 'false',
+        _inteiro(parametros, 'limite', estatistica.LIMITE_PARES),
+    )
+    return JSONResponse({'pares': pares, 'rejeitados': rejeitados, 'tabela': _tabela(tabela, *_pagina(parametros))})
+
+
+def prescrever(requisicao, corpo):
+    # /prescricao?grupos=nome_regiao&notas=nota_saeb_matematica&alvo=ideb&total=1000
+    parametros = requisicao.query_params
+    df, _ = base()
+    solucao = prescricao.alocar(
+        df, _lista(parametros, 'grupos'), _lista(parametros, 'notas'), _obrigatorio(parametros, 'alvo'),
+        float(parametros.get('impacto', 1.0)), float(_obrigatorio(parametros, 'total')),
+        parametros.get('divisao', 'igual'),
+    )
+    return JSONResponse({'status': solucao['status'], 'tabela': _tabela(prescricao.tabela(solucao))})
+
+
+def solicitar_modelo(requisicao, corpo):
+    # POST /modelos {"tipo": "linear", "alvo": "ideb", "atributos": [...], "parametros": {...}}
+    # devolve o identificador; o treino roda no pool de processos de motor.modelos
+    df, _ = base()
+    tipo, alvo = corpo['tipo'], corpo.get('alvo')
+    atributos, parametros = list(corpo['atributos']), dict(corpo.get('parametros', {}))
+    if isinstance(df, externo.BaseExterna):
+        raise ValueError('Modelos exigem a base em memória')
+    codificado = modelos.codificar(df, atributos + ([alvo] if alvo else []))
+    identificador = modelos.solicitar(
+        tipo, df.attrs.get('versao'), alvo, atributos, parametros,
+        codificado[atributos], codificado[alvo] if alvo else None,
+    )
+    return JSONResponse({'id': identificador}, status_code=202)
+
+
+def consultar_modelo(requisicao, corpo):
+    # 202 enquanto treina; métricas escalares por padrão e os vetores com completo=true
+    identificador = requisicao.path_params['identificador']
+    try:
+        resultado = modelos.resultado(identificador)
+    except Exception as erro:
+        return JSONResponse({'id': identificador, 'erro': str(erro)}, status_code=500)
+    if resultado is None:
+        estado = 'treinando' if modelos.pendentes([identificador]) else 'desconhecido'
+        return JSONResponse({'id': identificador, 'estado': estado}, status_code=202 if estado == 'treinando' else 404)
+    completo = requisicao.query_params.get('completo', 'false').lower() == 'true'
+    valores = {
+        nome: _json(valor) for nome, valor in resultado.items()
+        if completo or np.ndim(valor) == 0 or nome == 'variancia'
+    }
+    return JSONResponse({'id': identificador, 'estado': 'pronto', **valores})
+
+
+def exportar(requisicao, corpo):
+    # Recorte da base (filtros, colunas e ordem) em fluxo, bloco a bloco, no formato pedido;
+    # é o destino do botão de exportação da tabela quando IDEB_API está configurada
+    parametros = requisicao.query_params
+    df, _ = base()
+    if isinstance(df, externo.BaseExterna):
+        raise ValueError('Exportação da base exige a base em memória')
+    formato = parametros.get('formato', 'csv')
+    compactar = formato == 'csv' and parametros.get('compactar', 'false').lower() == 'true'
+    colunas = _lista(parametros, 'colunas') or None
+    filtrado = filtros(parametros)
+    ordem = parametros.get('ordem')
+    if ordem:
+        # Mesma ordem da página da tabela; só a coluna pedida é ordenada
+        if ordem not in df.columns:
+            raise KeyError(f'Coluna inexistente: {ordem}')
+        crescente = parametros.get('crescente', 'true').lower() != 'false'
+        selecionadas = paginacao.posicoes(
+            df, filtrado, paginacao.IndicesOrdenacao(df, [ordem]), ordem, crescente
+        )
+    else:
+        selecionadas = agregacao.linhas(df, filtrado) if filtrado else None
+    partes = exportacao.GERADORES[formato](exportacao.blocos(df, selecionadas, colunas))
+    if compactar:
+        partes = exportacao.comprimir(partes)
+    nome = exportacao.nome_arquivo('ideb', formato, compactar)
+    # O StreamingResponse consome o gerador no pool de threads
+    return StreamingResponse(
+        partes, media_type=exportacao.mime(formato, compactar),
+        headers={'Content-Disposition': f'attachment; filename="{nome}"'},
+    )
+
+
+app = Starlette(routes=[
+    Route('/saude', _responder(saude)),
+    Route('/esquema', _responder(consultar_esquema)),
+    Route('/membros/{coluna}', _responder(membros)),
+    Route('/agregar', _responder(agregar)),
+    Route('/pivotar', _responder(pivotar)),
+    Route('/serie', _responder(serie)),
+    Route('/tukey', _responder(tukey)),
+    Route('/prescricao', _responder(prescrever)),
+    Route('/modelos', _responder(solicitar_modelo), methods=['POST']),
+    Route('/modelos/{identificador}', _responder(consultar_modelo)),
+    Route('/exportar', _responder(exportar)),
+])
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    argumentos = argparse.ArgumentParser(description='API de consultas do IDEB')
+    argumentos.add_argument('--host', default='127.0.0.1')
+    argumentos.add_argument('--porta', type=int, default=8000)
+    argumentos = argumentos.parse_args()
+    # Um único processo: a base e os caches ficam compartilhados entre as requisições
+    uvicorn.run(app, host=argumentos.host, port=argumentos.porta)
@@ -0,0 +1,64 @@
+import importlib
+import os
+import threading
+
+import pandas as pd
+
+from motor import indice, olap
+
+# Pré-aquecimento em segundo plano, depois da primeira página exibida: importa os
+# módulos pesados das outras páginas e materializa o cubo e o índice da base, para
+# que a primeira visita a essas páginas não pague por isso. IDEB_PREAQUECER=0 desliga.
+ATIVO = os.environ.get('IDEB_PREAQUECER', '1') != '0'
+# Importados só pelas páginas que os usam (ou na primeira chamada que precisa deles)
+MODULOS = [
+    'plotly.express',
+    'plotly.graph_objects',
+    'streamlit_extras.metric_cards',
+    'scipy.stats',
+    'joblib',
+    'sklearn.model_selection',
+    'pulp',
+    'pygwalker.api.streamlit',
+]
+
+_threads = {}
+_trava = threading.Lock()
+
+
+def importar(modulos=MODULOS):
+    # Módulos ausentes são ignorados: a página correspondente acusa o erro quando aberta
+    importados = []
+    for nome in modulos:
+        try:
+            importlib.import_module(nome)
+        except ImportError:
+            continue
+        importados.append(nome)
+    return importados
+
+
+def _executar(df):
+    importar()
+    if isinstance(df, pd.DataFrame):
+        olap.cubo_para(df)
+        indice.indice_para(df)
+
+
+def iniciar(df):
+    # Uma thread por versão da base e por processo; as sessões seguintes não fazem nada
+    versao = df.attrs.get('versao')
+    with _trava:
+        if not ATIVO or versao in _threads:
+            return None
+        _threads[versao] = threading.Thread(target=_executar, args=(df,), name='aquecimento', daemon=True)
+        _threads[versao].start()
+        return _threads[versao]
+
+
+def aguardar(timeout=None):
+    # Usado pelo benchmark de inicialização
+    with _trava:
+        threads = list(_threads.values())
+    for thread in threads:
+        thread.join(timeout)
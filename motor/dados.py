@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from motor import esquema
+from motor.instrumentacao import medido
+
+# Copy-on-Write: filtros e projeções feitos pelas páginas não copiam a base compartilhada
+pd.options.mode.copy_on_write = True
+
+ARQUIVO_XLSX = os.path.join('data', 'ideb.xlsx')
+PASTA_CACHE = os.path.join('data', 'cache')
+# Uma partição Feather (sem compressão, mapeável) por edição do IDEB
+PASTA_PARTICOES = 'ideb'
+# Sessões que abrem juntas não convertem o mesmo xlsx em paralelo
+_trava = threading.Lock()
+
+
+def _hash_arquivo(caminho, bloco=1 << 20):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for parte in iter(lambda: arquivo.read(bloco), b''):
+            sha.update(parte)
+    return sha.hexdigest()
+
+
+def _ler_manifesto(pasta_cache):
+    try:
+        with open(os.path.join(pasta_cache, 'manifesto.json'), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _gravar_manifesto(pasta_cache, manifesto):
+    caminho = os.path.join(pasta_cache, 'manifesto.json')
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _versao(particoes):
+    # A versão da base muda sempre que alguma partição muda
+    tokens = sorted(p['token'] for p in particoes.values())
+    return hashlib.sha1(json.dumps(tokens).encode('utf-8')).hexdigest()[:16]
+
+
+def aplicar_tipos(df):
+    # Tipos compactos definidos no esquema: textos como categorias, inteiros e medidas
+    # reduzidos e indicadores como booleanos. Colunas já convertidas ficam como estão.
+    for coluna in esquema.categoricas():
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+    for coluna in esquema.MEDIDA:
+        if coluna in df.columns and df[coluna].dtype != esquema.TIPO_MEDIDA:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype(esquema.TIPO_MEDIDA)
+    for coluna, tipo in esquema.INTEIRAS.items():
+        # Só quando todos os valores cabem no tipo menor (e não há nulos)
+        if coluna in df.columns and df[coluna].dtype != tipo and df[coluna].notna().all() and len(df):
+            limites = np.iinfo(tipo)
+            if limites.min <= df[coluna].min() and df[coluna].max() <= limites.max:
+                df[coluna] = df[coluna].astype(tipo)
+    for coluna in esquema.BOOLEANAS:
+        if coluna in df.columns and df[coluna].dtype != bool:
+            df[coluna] = df[coluna].astype('boolean' if df[coluna].isna().any() else 'bool')
+    return df
+
+
+def _ler_origem(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == '.csv':
+        df = pd.read_csv(caminho)
+    elif extensao == '.parquet':
+        df = pd.read_parquet(caminho)
+    elif extensao == '.feather':
+        df = pd.read_feather(caminho)
+    else:
+        df = pd.read_excel(caminho)
+    df = df.drop(columns=[c for c in esquema.DESCARTADAS if c in df.columns])
+    return aplicar_tipos(df).reset_index(drop=True)
+
+
+def _gravar_particoes(df, pasta_cache, origem, chave):
+    pasta = os.path.join(pasta_cache, PASTA_PARTICOES)
+    os.makedirs(pasta, exist_ok=True)
+    particoes = {}
+    for ano, parte in df.groupby('ano', sort=True):
+        arquivo = f'ano={ano}-{chave[:12]}.feather'
+        destino = os.path.join(pasta, arquivo)
+        parte.reset_index(drop=True).to_feather(destino + '.tmp', compression='uncompressed')
+        os.replace(destino + '.tmp', destino)
+        particoes[str(ano)] = {'arquivo': arquivo, 'origem': origem, 'token': f'{chave[:12]}-{ano}'}
+    return particoes
+
+
+def _tabelas(pasta_cache, particoes):
+    # Partições mapeadas em memória, em ordem de ano: nada é lido até ser usado
+    pasta = os.path.join(pasta_cache, PASTA_PARTICOES)
+    return [
+        feather.read_table(os.path.join(pasta, p['arquivo']), memory_map=True)
+        for _, p in sorted(particoes.items())
+    ]
+
+
+def _valores(coluna):
+    # Valores distintos de uma coluna Arrow; nas categóricas basta ler o dicionário
+    if pa.types.is_dictionary(coluna.type):
+        return {v for pedaco in coluna.chunks for v in pedaco.dictionary.to_pylist() if v is not None}
+    return set(pc.unique(coluna).drop_null().to_pylist())
+
+
+def _categorias(tabelas):
+    # Dicionário unificado (e ordenado) de cada coluna categórica, para toda a base
+    categorias = {}
+    for tabela in tabelas:
+        for coluna in esquema.categoricas():
+            if coluna in tabela.column_names:
+                categorias.setdefault(coluna, set()).update(_valores(tabela[coluna]))
+    return {coluna: sorted(valores) for coluna, valores in categorias.items()}
+
+
+def _recodificar(coluna, categorias):
+    # Códigos da coluna no dicionário unificado: só os índices são reescritos, os textos não
+    tipo = pa.int8() if len(categorias) < 2 ** 7 else pa.int16() if len(categorias) < 2 ** 15 else pa.int32()
+    pedacos = []
+    for pedaco in coluna.chunks:
+        if pa.types.is_dictionary(pedaco.type) and pedaco.dictionary.equals(categorias):
+            # Já no dicionário unificado: os índices continuam os do arquivo mapeado
+            indices = pedaco.indices
+        elif pa.types.is_dictionary(pedaco.type):
+            mapa = pc.index_in(pedaco.dictionary.cast(categorias.type), value_set=categorias)
+            indices = pc.take(mapa.cast(tipo), pedaco.indices)
+        else:
+            # Partição de um esquema anterior, com a coluna em texto
+            indices = pc.index_in(pedaco.cast(categorias.type), value_set=categorias)
+        if indices.type != tipo:
+            indices = indices.cast(tipo)
+        pedacos.append(pa.DictionaryArray.from_arrays(indices, categorias))
+    return pa.chunked_array(pedacos, pa.dictionary(tipo, categorias.type))
+
+
+def _remover_orfaos(pasta_cache, particoes):
+    # Apaga partições substituídas e o arquivo único do formato anterior
+    usados = {p['arquivo'] for p in particoes.values()}
+    pasta = os.path.join(pasta_cache, PASTA_PARTICOES)
+    for arquivo in os.listdir(pasta):
+        if arquivo.endswith('.feather') and arquivo not in usados:
+            os.remove(os.path.join(pasta, arquivo))
+    for arquivo in os.listdir(pasta_cache):
+        if arquivo.startswith('ideb-') and arquivo.endswith('.feather'):
+            os.remove(os.path.join(pasta_cache, arquivo))
+
+
+def converter_xlsx(caminho=ARQUIVO_XLSX, pasta_cache=PASTA_CACHE, chave=None):
+    # Lê o xlsx uma única vez e grava uma partição por ano.
+    # Edições ingeridas de outros arquivos são mantidas se o xlsx não as contém.
+    chave = chave or _hash_arquivo(caminho)
+    df = _ler_origem(caminho)
+
+    manifesto = _ler_manifesto(pasta_cache)
+    particoes = {
+        ano: p for ano, p in manifesto.get('particoes', {}).items() if p['origem'] != caminho
+    }
+    particoes.update(_gravar_particoes(df, pasta_cache, caminho, chave))
+
+    info = os.stat(caminho)
+    _gravar_manifesto(pasta_cache, {
+        'origem': caminho,
+        'mtime': info.st_mtime_ns,
+        'tamanho': info.st_size,
+        'hash': chave,
+        'particoes': particoes,
+        'categorias': _categorias(_tabelas(pasta_cache, particoes)),
+        'versao': _versao(particoes),
+    })
+    _remover_orfaos(pasta_cache, particoes)
+
+
+@medido()
+def ingerir_edicao(caminho, pasta_cache=PASTA_CACHE):
+    # Acrescenta (ou substitui) só as partições dos anos presentes no arquivo da nova edição
+    chave = _hash_arquivo(caminho)
+    df = _ler_origem(caminho)
+
+    manifesto = _ler_manifesto(pasta_cache)
+    if not manifesto:
+        raise FileNotFoundError(f'Base não encontrada em {pasta_cache}: carregue o xlsx principal antes')
+    anterior = manifesto['versao']
+    novas = _gravar_particoes(df, pasta_cache, caminho, chave)
+    manifesto['particoes'].update(novas)
+    manifesto['categorias'] = _categorias(_tabelas(pasta_cache, manifesto['particoes']))
+    manifesto['versao'] = _versao(manifesto['particoes'])
+    manifesto['ultima_ingestao'] = {
+        'versao_anterior': anterior,
+        'versao': manifesto['versao'],
+        'anos': sorted(int(ano) for ano in novas),
+    }
+    _gravar_manifesto(pasta_cache, manifesto)
+    _remover_orfaos(pasta_cache, manifesto['particoes'])
+    return manifesto['versao']
+
+
+def _ler_particoes(pasta_cache, manifesto):
+    # As partições são concatenadas como tabelas Arrow, com as colunas categóricas no
+    # dicionário unificado do manifesto, e convertidas para pandas uma única vez: a base
+    # ocupa uma cópia em memória (colunas contíguas, com NaN nas medidas), sem as cópias
+    # intermediárias de cada partição
+    tabelas = _tabelas(pasta_cache, manifesto['particoes'])
+    # Manifestos gravados antes dos dicionários unificados: lidos das próprias partições
+    categorias = manifesto.get('categorias') or _categorias(tabelas)
+    dicionarios = {coluna: pa.array(valores, pa.string()) for coluna, valores in categorias.items()}
+    for i, tabela in enumerate(tabelas):
+        for coluna, dicionario in dicionarios.items():
+            if coluna in tabela.column_names:
+                posicao = tabela.column_names.index(coluna)
+                tabela = tabela.set_column(posicao, coluna, _recodificar(tabela[coluna], dicionario))
+        tabelas[i] = tabela.replace_schema_metadata(None)
+    tabela = pa.concat_tables(tabelas, promote_options='permissive') if len(tabelas) > 1 else tabelas[0]
+    del tabelas
+    # self_destruct libera cada coluna Arrow assim que é convertida. Partições gravadas
+    # com tipos de um esquema anterior são convertidas depois; nas atuais aplicar_tipos
+    # não toca em nenhuma coluna
+    return aplicar_tipos(tabela.to_pandas(split_blocks=True, self_destruct=True))
+
+
+def _preparar(caminho, pasta_cache):
+    # Garante que as partições correspondem ao xlsx e devolve o manifesto.
+    # O hash só é recalculado quando o mtime ou o tamanho do xlsx mudam
+    with _trava:
+        info = os.stat(caminho)
+        manifesto = _ler_manifesto(pasta_cache)
+        inalterado = manifesto.get('mtime') == info.st_mtime_ns and manifesto.get('tamanho') == info.st_size
+        if not inalterado or 'particoes' not in manifesto:
+            chave = _hash_arquivo(caminho)
+            if chave != manifesto.get('hash') or 'particoes' not in manifesto:
+                converter_xlsx(caminho, pasta_cache, chave)
+            else:
+                # xlsx tocado sem mudança de conteúdo: só atualiza mtime e tamanho
+                manifesto.update(mtime=info.st_mtime_ns, tamanho=info.st_size)
+                _gravar_manifesto(pasta_cache, manifesto)
+            manifesto = _ler_manifesto(pasta_cache)
+        return manifesto
+
+
+def versao_atual(caminho=ARQUIVO_XLSX, pasta_cache=PASTA_CACHE):
+    # Chave do cache da base, lida a cada execução (um stat e a leitura do manifesto).
+    # Um xlsx alterado, ou um cache ainda inexistente, é convertido antes: a chave
+    # já é a versão que carregar_ideb vai devolver.
+    return _preparar(caminho, pasta_cache)['versao']
+
+
+@medido()
+def carregar_ideb(caminho=ARQUIVO_XLSX, pasta_cache=PASTA_CACHE):
+    manifesto = _preparar(caminho, pasta_cache)
+    df = _ler_particoes(pasta_cache, manifesto)
+    # Versões da base e de cada partição, usadas para invalidar agregados e caches
+    df.attrs['versao'] = manifesto['versao']
+    df.attrs['particoes'] = {int(ano): p['token'] for ano, p in manifesto['particoes'].items()}
+    ingestao = manifesto.get('ultima_ingestao')
+    if ingestao and ingestao['versao'] == manifesto['versao']:
+        df.attrs['versao_anterior'] = ingestao['versao_anterior']
+        df.attrs['anos_novos'] = ingestao['anos']
+    return df
+
+
+if __name__ == '__main__':
+    # python -m motor.dados data/ideb_2025.xlsx
+    for arquivo in sys.argv[1:]:
+        print(arquivo, '->', ingerir_edicao(arquivo))
@@ -0,0 +1,25 @@
+# Esquema da base do IDEB compartilhado entre o carregamento e as páginas
+DIMENSAO = [
+    'cidade', 'nome_uf','nome_regiao','rede','ensino','anos_escolares', 'nome_regiao_saude', 'nome_regiao_imediata', 'nome_regiao_intermediaria', 'nome_microrregiao', 'nome_mesorregiao','nome_regiao_metropolitana','nome_uf','nome_regiao','amazonia_legal'
+]
+DIMENSAO_TEMPO = ['ano']
+MEDIDA = ['taxa_aprovacao', 'nota_saeb_matematica', 'nota_saeb_lingua_portuguesa','nota_saeb_media_padronizada', 'indicador_rendimento','ideb']
+AGREGADOR = ['sum', 'mean', 'count', 'min', 'max']
+
+# Colunas do xlsx que não são usadas pela aplicação
+DESCARTADAS = ['ddd', 'capital_uf']
+
+# Tipos aplicados no carregamento (dados.aplicar_tipos)
+TIPO_MEDIDA = 'float32'
+INTEIRAS = {'ano': 'int16', 'id_municipio': 'int32'}
+BOOLEANAS = ['amazonia_legal']
+
+
+def dimensoes():
+    # A lista exibida nos widgets repete 'nome_uf' e 'nome_regiao'
+    return list(dict.fromkeys(DIMENSAO))
+
+
+def categoricas():
+    # Colunas de texto guardadas como categorias
+    return [c for c in dimensoes() + ['sigla_uf'] if c not in BOOLEANAS]
@@ -0,0 +1,178 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from motor import agregacao
+from motor.instrumentacao import medido
+
+# Máximo de pares de grupos levados para a tabela de comparações
+LIMITE_PARES = 5_000
+# Elementos por bloco da matriz de diferenças (linhas do bloco x grupos)
+TAMANHO_BLOCO = 2_000_000
+
+
+def suficientes(df, coluna, medida):
+    # n, soma e soma dos quadrados de cada grupo de `coluna` em cada ano, numa só passada
+    def calcular():
+        valores = df[medida].astype('float64')
+        base = pd.DataFrame({
+            'ano': df['ano'], coluna: df[coluna], 'soma': valores, 'quadrados': valores * valores
+        })
+        grupos = base.groupby(['ano', coluna], observed=True)
+        resultado = grupos[['soma', 'quadrados']].sum()
+        resultado.insert(0, 'n', grupos['soma'].count())
+        return resultado
+
+    return agregacao._memorizar(df, ('suficientes', coluna, medida), calcular)
+
+
+def grupos_do_ano(df, coluna, medida, ano):
+    # Estatísticas por grupo de um ano: n, média e soma dos quadrados dos desvios
+    estatisticas = suficientes(df, coluna, medida)
+    if ano not in estatisticas.index.get_level_values('ano'):
+        return pd.DataFrame(columns=['n', 'media', 'desvios'])
+    ano_atual = estatisticas.xs(ano, level='ano')
+    ano_atual = ano_atual[ano_atual['n'] > 0]
+    return pd.DataFrame({
+        'n': ano_atual['n'],
+        'media': ano_atual['soma'] / ano_atual['n'],
+        'desvios': ano_atual['quadrados'] - ano_atual['soma'] ** 2 / ano_atual['n'],
+    })
+
+
+def edicao_anterior(anos, ano):
+    # O IDEB é bienal: a edição anterior é a última presente nos dados, não ano - 1
+    anteriores = [a for a in anos if a < ano]
+    return max(anteriores) if anteriores else None
+
+
+@medido()
+def indice_temporal(df, coluna, medida):
+    # Série anual (soma) de `medida` para cada membro de `coluna`, com o resumo
+    # usado pelos indicadores, calculada uma vez por versão da base:
+    #   valores: membros x anos
+    #   resumo: membros x (media, ls, li, quantis, limites de outliers)
+    #   total: soma de toda a base em cada ano
+    def calcular():
+        valores = suficientes(df, coluna, medida)['soma'].unstack('ano')
+        quantis = valores.quantile([0.25, 0.5, 0.75], axis=1).T
+        media = valores.mean(axis=1)
+        erro = valores.std(axis=1) * 1.96 / np.sqrt(valores.count(axis=1))
+        iqr = quantis[0.75] - quantis[0.25]
+        resumo = pd.DataFrame({
+            'min': valores.min(axis=1),
+            'q25': quantis[0.25],
+            'q50': quantis[0.5],
+            'q75': quantis[0.75],
+            'max': valores.max(axis=1),
+            'media': media,
+            'ls': media + erro,
+            'li': media - erro,
+            'out_min': quantis[0.25] - iqr * 1.5,
+            'out_max': quantis[0.75] + iqr * 1.5,
+        })
+        total = df[medida].astype('float64').groupby(df['ano']).sum()
+        return {'valores': valores, 'resumo': resumo, 'total': total}
+
+    return agregacao._memorizar(df, ('indice_temporal', coluna, medida), calcular)
+
+
+def serie(indice, membro):
+    # Evolução anual de um membro, só com as edições em que ele aparece
+    return indice['valores'].loc[membro].dropna()
+
+
+def valor(indice, membro, ano):
+    # Soma do membro no ano; 0 quando o membro não aparece nessa edição
+    valores = indice['valores']
+    if ano not in valores.columns or pd.isna(valores.at[membro, ano]):
+        return 0.0
+    return valores.at[membro, ano]
+
+
+def classificar(valores, resumo):
+    # Posição de cada valor em relação à média e aos limites de outliers do membro
+    return np.select(
+        [valores > resumo['out_max'], valores > resumo['ls'], valores > resumo['li'], valores > resumo['out_min']],
+        ['outlier acima', 'acima da média', 'média', 'abaixo da média'],
+        default='outlier abaixo',
+    )
+
+
+def _pares(media, n, escala, critico, apenas_rejeitados, limite):
+    # Percorre o triângulo superior da matriz de pares em blocos de linhas,
+    # mantendo só os `limite` pares com maior estatística q
+    k = len(media)
+    linhas_bloco = max(1, TAMANHO_BLOCO // max(k, 1))
+    melhores_i = np.empty(0, dtype='int64')
+    melhores_j = np.empty(0, dtype='int64')
+    melhores_q = np.empty(0, dtype='float64')
+    total, rejeitados = 0, 0
+    for inicio in range(0, k - 1, linhas_bloco):
+        i = np.arange(inicio, min(inicio + linhas_bloco, k - 1))
+        j = np.arange(k)
+        superior = j[None, :] > i[:, None]
+        diferenca = np.abs(media[None, :] - media[i, None])
+        erro = np.sqrt(escala * (1 / n[i, None] + 1 / n[None, :]))
+        q = np.divide(diferenca, erro, out=np.zeros_like(diferenca), where=erro > 0)
+        rejeita = superior & (q > critico)
+        total += int(superior.sum())
+        rejeitados += int(rejeita.sum())
+
+        pi, pj = np.nonzero(rejeita if apenas_rejeitados else superior)
+        candidatos_i = np.concatenate([melhores_i, i[pi]])
+        candidatos_j = np.concatenate([melhores_j, pj])
+        candidatos_q = np.concatenate([melhores_q, q[pi, pj]])
+        if len(candidatos_q) > limite:
+            topo = np.argpartition(-candidatos_q, limite - 1)[:limite]
+            candidatos_i, candidatos_j, candidatos_q = candidatos_i[topo], candidatos_j[topo], candidatos_q[topo]
+        melhores_i, melhores_j, melhores_q = candidatos_i, candidatos_j, candidatos_q
+    return melhores_i, melhores_j, melhores_q, total, rejeitados
+
+
+@medido()
+def tukey(df, coluna, medida, ano, alpha=0.05, apenas_rejeitados=True, limite=LIMITE_PARES):
+    # Teste de Tukey-Kramer entre os grupos de `coluna` no ano, equivalente ao
+    # pairwise_tukeyhsd. Devolve a tabela (no máximo `limite` pares, os mais
+    # distantes primeiro), o total de pares e o total de pares rejeitados.
+    def calcular():
+        grupos = grupos_do_ano(df, coluna, medida, ano)
+        k, total_n = len(grupos), grupos['n'].sum()
+        tabela = pd.DataFrame({
+            'grupo1': pd.Series(dtype=object), 'grupo2': pd.Series(dtype=object),
+            'reject': pd.Series(dtype=bool), 'meandiffs': pd.Series(dtype='float64'),
+        })
+        if k < 2 or total_n <= k:
+            return {'tabela': tabela, 'pares': k * (k - 1) // 2, 'rejeitados': 0}
+
+        media = grupos['media'].to_numpy(dtype='float64')
+        n = grupos['n'].to_numpy(dtype='float64')
+        graus = total_n - k
+        # Variância dentro dos grupos (quadrado médio do erro)
+        escala = grupos['desvios'].sum() / graus / 2
+        # O scipy só é importado quando o teste é de fato calculado
+        from scipy.integrate import IntegrationWarning
+        from scipy.stats import studentized_range
+        with warnings.catch_warnings():
+            # Com milhares de grupos a integração numérica avisa mesmo convergindo
+            warnings.simplefilter('ignore', IntegrationWarning)
+            critico = studentized_range.isf(alpha, k, graus)
+        i, j, q, total, rejeitados = _pares(media, n, escala, critico, apenas_rejeitados, limite)
+
+        # Pares na mesma ordem de combinations() quando todos cabem na tabela
+        selecionados = rejeitados if apenas_rejeitados else total
+        ordem = np.lexsort((j, i)) if selecionados <= limite else np.argsort(-q, kind='stable')
+        i, j, q = i[ordem], j[ordem], q[ordem]
+        rotulos = grupos.index.to_numpy()
+        tabela = pd.DataFrame({
+            'grupo1': rotulos[i],
+            'grupo2': rotulos[j],
+            'reject': q > critico,
+            'meandiffs': media[j] - media[i],
+        })
+        return {'tabela': tabela, 'pares': total, 'rejeitados': rejeitados}
+
+    chave = ('tukey', coluna, medida, ano, alpha, apenas_rejeitados, limite)
+    resultado = agregacao._memorizar(df, chave, calcular, {'ano': ano})
+    return resultado['tabela'].copy(deep=False), resultado['pares'], resultado['rejeitados']
@@ -0,0 +1,137 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Agregações decomponíveis: como os parciais de cada partição são combinados
+COMBINACAO = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+# Colunas pelas quais a tabela fato é dividida entre os trabalhadores
+CHAVES_PARTICAO = ['ano', 'sigla_uf']
+# Abaixo disso o custo de dividir e juntar os parciais supera o ganho
+LINHAS_MINIMAS = 500_000
+
+# 'paralelo' (pool de threads sobre a mesma tabela) ou 'pandas' (uma thread)
+backend = os.environ.get('IDEB_BACKEND', 'paralelo')
+trabalhadores = int(os.environ.get('IDEB_TRABALHADORES', os.cpu_count() or 1))
+
+_pool = None
+_trava = threading.Lock()
+
+
+def configurar(nome=None, n=None):
+    # Troca o backend ou o número de trabalhadores (usado pelos benchmarks)
+    global backend, trabalhadores, _pool
+    with _trava:
+        if nome is not None:
+            backend = nome
+        if n is not None and n != trabalhadores:
+            trabalhadores = n
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+                _pool = None
+
+
+def _executor():
+    # Threads: as partições são fatias da mesma tabela em memória, sem cópia nem
+    # serialização, e os kernels de agregação do pandas liberam o GIL
+    global _pool
+    with _trava:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='agregacao')
+        return _pool
+
+
+def _pandas(df, grupos, colunas, agregador, dropna):
+    return df.groupby(grupos, observed=True, dropna=dropna)[colunas].agg(agregador)
+
+
+def _parciais(df, grupos, pedidos, dropna):
+    # Os grupos são calculados uma vez para todos os agregados pedidos
+    agrupado = df.groupby(grupos, observed=True, dropna=dropna)
+    return [getattr(agrupado[colunas], funcao)() for funcao, colunas in pedidos]
+
+
+def _codigos(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.array.codes
+    return pd.factorize(serie)[0]
+
+
+def particoes(df, chave):
+    # Uma partição por membro da chave. A base é gravada por edição, então as linhas
+    # de cada ano já são contíguas e as partições são só fatias (visões) da tabela.
+    codigos = _codigos(df[chave])
+    if np.all(codigos[1:] >= codigos[:-1]):
+        limites = np.flatnonzero(np.diff(codigos)) + 1
+        inicios, fins = np.r_[0, limites], np.r_[limites, len(df)]
+        return [df.iloc[inicio:fim] for inicio, fim in zip(inicios, fins)]
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.flatnonzero(np.diff(codigos[ordem])) + 1
+    return [df.take(linhas) for linhas in np.split(ordem, limites)]
+
+
+def _subdividir(partes, n):
+    # Com menos partições que trabalhadores, as maiores são fatiadas em blocos contíguos
+    linhas = sum(len(parte) for parte in partes)
+    blocos = []
+    for parte in partes:
+        pedacos = max(1, round(n * len(parte) / linhas))
+        limites = np.linspace(0, len(parte), pedacos + 1).astype('int64')
+        blocos.extend(parte.iloc[inicio:fim] for inicio, fim in zip(limites[:-1], limites[1:]))
+    return blocos
+
+
+def _chave(df, grupos):
+    # Preferência por uma chave agrupada: os parciais ficam disjuntos e só são concatenados
+    candidatas = [c for c in CHAVES_PARTICAO if c in df.columns]
+    agrupadas = [c for c in candidatas if c in grupos]
+    return (agrupadas or candidatas or [None])[0]
+
+
+def _paralelizar(df, grupos):
+    return backend == 'paralelo' and trabalhadores > 1 and len(df) >= LINHAS_MINIMAS and grupos
+
+
+def agrupar_varios(df, grupos, pedidos, dropna=True):
+    # pedidos: [(agregador decomponível, colunas)], todos sobre os mesmos grupos.
+    # Em paralelo, cada partição da tabela calcula os parciais e eles são combinados.
+    grupos = list(grupos)
+    chave = _chave(df, grupos) if _paralelizar(df, grupos) else None
+    if chave is None:
+        return _parciais(df, grupos, pedidos, dropna)
+
+    colunas = [c for _, cs in pedidos for c in ([cs] if isinstance(cs, str) else cs)]
+    partes = particoes(df[list(dict.fromkeys(grupos + [chave] + colunas))], chave)
+    # Partições disjuntas nos grupos dispensam a reagregação dos parciais
+    disjuntas = chave in grupos and len(partes) >= trabalhadores
+    if len(partes) < trabalhadores:
+        partes = _subdividir(partes, trabalhadores)
+
+    tarefas = [_executor().submit(_parciais, parte, grupos, pedidos, dropna) for parte in partes]
+    resultados = [tarefa.result() for tarefa in tarefas]
+
+    combinados = []
+    for i, (funcao, _) in enumerate(pedidos):
+        parciais = pd.concat([resultado[i] for resultado in resultados])
+        if disjuntas:
+            # Cada grupo está inteiro numa só partição
+            combinados.append(parciais.sort_index())
+        else:
+            niveis = list(range(len(grupos)))
+            combinados.append(
+                parciais.groupby(level=niveis, observed=True, dropna=dropna).agg(COMBINACAO[funcao])
+            )
+    return combinados
+
+
+def agrupar(df, grupos, colunas, agregador='sum', dropna=True):
+    # Equivalente a df.groupby(grupos, observed=True, dropna=dropna)[colunas].agg(agregador),
+    # calculado em paralelo quando a tabela é grande e o agregador decomponível
+    if not _paralelizar(df, grupos) or not (agregador in COMBINACAO or agregador == 'mean'):
+        return _pandas(df, grupos, colunas, agregador, dropna)
+    if agregador == 'mean':
+        soma, contagem = agrupar_varios(df, grupos, [('sum', colunas), ('count', colunas)], dropna)
+        return soma / contagem.where(contagem > 0)
+    return agrupar_varios(df, grupos, [(agregador, colunas)], dropna)[0]
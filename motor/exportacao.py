@@ -0,0 +1,165 @@
+import os
+import tempfile
+import zlib
+from urllib.parse import urlencode
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Linhas escritas por bloco e memória usada pelo arquivo temporário do xlsx antes de ir para o disco
+TAMANHO_BLOCO = 100_000
+LIMITE_MEMORIA = 32 * 1024 * 1024
+# Endereço da API (python -m motor.api) que gera a exportação da tabela em fluxo, bloco a
+# bloco. Sem ela o arquivo é montado inteiro na memória do servidor, como o
+# st.download_button exige, e só até LIMITE_LINHAS_MEMORIA linhas
+API = os.environ.get('IDEB_API')
+LIMITE_LINHAS_MEMORIA = 1_000_000
+# Linhas de dados por planilha do xlsx (o Excel aceita 1.048.576 contando o cabeçalho)
+LINHAS_XLSX = 1_048_575
+# Tipo MIME e extensão de cada formato; o CSV pode ser compactado com gzip
+FORMATOS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/octet-stream', '.parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+}
+
+
+def blocos(df, linhas=None, colunas=None, tamanho=TAMANHO_BLOCO):
+    # Gera fatias do recorte sem materializar o recorte inteiro
+    total = len(df) if linhas is None else len(linhas)
+    if total == 0:
+        # Recorte vazio: um bloco sem linhas, para que o arquivo tenha o cabeçalho
+        yield df.iloc[:0][colunas] if colunas else df.iloc[:0]
+    for inicio in range(0, total, tamanho):
+        if linhas is None:
+            bloco = df.iloc[inicio:inicio + tamanho]
+        else:
+            bloco = df.iloc[linhas[inicio:inicio + tamanho]]
+        yield bloco[colunas] if colunas else bloco
+
+
+def plano(tabela):
+    # Pivôs e agregados: o índice vira coluna e colunas de vários níveis viram um nome só
+    if not isinstance(tabela.index, pd.RangeIndex):
+        tabela = tabela.reset_index()
+    if isinstance(tabela.columns, pd.MultiIndex):
+        tabela = tabela.set_axis(
+            [' | '.join(str(n) for n in coluna if str(n) != '') for coluna in tabela.columns], axis=1
+        )
+    return tabela.set_axis([str(c) for c in tabela.columns], axis=1)
+
+
+def gerar_csv(blocos):
+    for i, bloco in enumerate(blocos):
+        yield bloco.to_csv(index=False, header=i == 0).encode('utf-8')
+
+
+class _Coletor:
+    # Destino do ParquetWriter esvaziado depois de cada row group
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def esvaziar(self):
+        dados, self.partes = b''.join(self.partes), []
+        return dados
+
+
+def gerar_parquet(blocos):
+    # Um row group por bloco, compactado com zstd
+    coletor, escritor = _Coletor(), None
+    for bloco in blocos:
+        if escritor is None:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            escritor = pq.ParquetWriter(coletor, tabela.schema, compression='zstd')
+        else:
+            tabela = pa.Table.from_pandas(bloco, schema=escritor.schema, preserve_index=False)
+        escritor.write_table(tabela)
+        yield coletor.esvaziar()
+    if escritor is not None:
+        escritor.close()
+    yield coletor.esvaziar()
+
+
+def gerar_xlsx(blocos):
+    # openpyxl em modo write_only grava as linhas num arquivo temporário conforme chegam;
+    # uma planilha nova começa quando a anterior atinge o limite do Excel
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    planilha, usadas = None, LINHAS_XLSX
+    for bloco in blocos:
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        inicio = 0
+        while inicio < len(valores) or planilha is None:
+            if usadas == LINHAS_XLSX:
+                planilha = livro.create_sheet(f'dados{len(livro.worksheets) + 1}')
+                planilha.append([str(c) for c in bloco.columns])
+                usadas = 0
+            parte = valores.iloc[inicio:inicio + LINHAS_XLSX - usadas]
+            for linha in parte.itertuples(index=False, name=None):
+                planilha.append(linha)
+            inicio += len(parte)
+            usadas += len(parte)
+    if planilha is None:
+        livro.create_sheet('dados1')
+    with tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA) as arquivo:
+        livro.save(arquivo)
+        arquivo.seek(0)
+        yield from iter(lambda: arquivo.read(1 << 20), b'')
+
+
+GERADORES = {'csv': gerar_csv, 'parquet': gerar_parquet, 'xlsx': gerar_xlsx}
+
+
+def comprimir(partes, nivel=6):
+    # gzip em fluxo: cada parte é compactada assim que é gerada
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for parte in partes:
+        saida = compressor.compress(parte)
+        if saida:
+            yield saida
+    yield compressor.flush()
+
+
+def exportar(blocos, formato='csv', compactar=False):
+    # Arquivo inteiro em memória para o st.download_button, que só aceita bytes, texto ou
+    # buffers e os guarda na memória do servidor até o download: usado para os pivôs do
+    # cubo e para recortes da tabela de até LIMITE_LINHAS_MEMORIA linhas sem a API
+    partes = GERADORES[formato](blocos)
+    if compactar:
+        partes = comprimir(partes)
+    return b''.join(partes)
+
+
+def endereco(api, filtros, colunas, formato='csv', compactar=False, ordem=None, crescente=True):
+    # URL da rota /exportar da API para o mesmo recorte (filtros, colunas e ordem) da tabela
+    parametros = [('filtro', f"{coluna}:{','.join(str(v) for v in valores)}") for coluna, valores in filtros.items()]
+    parametros += [('colunas', ','.join(colunas)), ('formato', formato), ('compactar', str(compactar).lower())]
+    if ordem:
+        parametros += [('ordem', ordem), ('crescente', str(crescente).lower())]
+    return f"{api.rstrip('/')}/exportar?{urlencode(parametros)}"
+
+
+def nome_arquivo(nome, formato, compactar=False):
+    return nome + FORMATOS[formato][1] + ('.gz' if compactar else '')
+
+
+def mime(formato, compactar=False):
+    return 'application/gzip' if compactar else FORMATOS[formato][0]
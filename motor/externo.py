@@ -0,0 +1,276 @@
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from motor import dados
+from motor.instrumentacao import medido
+
+# Base fora da memória: um dataset particionado (Parquet por ano, ou as partições
+# Feather do cache da aplicação) consultado em lotes. Filtros e projeções descem
+# até a leitura dos arquivos e só os resultados agregados viram DataFrame.
+# Com o DuckDB instalado as agregações são feitas por ele (que usa o disco quando
+# falta memória); sem ele, pelo Arrow compute, lote a lote.
+
+# Memória máxima usada pelo DuckDB antes de passar a usar arquivos temporários
+LIMITE_MEMORIA = os.environ.get('IDEB_MEMORIA_EXTERNO', '2GB')
+LINHAS_LOTE = 1 << 20
+# Agregados parciais acumulados antes de reagregá-los, no caminho do Arrow
+PARCIAIS_MAXIMOS = 32
+
+SQL = {
+    'sum': 'coalesce(sum({}), 0)',
+    'mean': 'avg({})',
+    'count': 'count({})',
+    'min': 'min({})',
+    'max': 'max({})',
+}
+# Agregados parciais de cada agregador e como são reagregados
+PARCIAIS = {'sum': ['sum'], 'mean': ['sum', 'count'], 'count': ['count'], 'min': ['min'], 'max': ['max']}
+COMBINACAO = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+@functools.lru_cache(maxsize=None)
+def _duckdb():
+    # Importado na primeira consulta: a aplicação importa este módulo mesmo sem base externa
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def _hash(valor):
+    return hashlib.sha1(json.dumps(valor).encode('utf-8')).hexdigest()[:16]
+
+
+def _arquivos_parquet(caminho):
+    if os.path.isfile(caminho):
+        return [caminho]
+    return sorted(
+        os.path.join(pasta, arquivo)
+        for pasta, _, arquivos in os.walk(caminho) for arquivo in arquivos if arquivo.endswith('.parquet')
+    )
+
+
+def _ano(caminho):
+    # Ano da partição no layout hive (.../ano=2021/parte-0.parquet)
+    for parte in caminho.split(os.sep):
+        if parte.startswith('ano='):
+            return int(parte[4:])
+    return None
+
+
+def _descrever(caminho):
+    # Arquivos, formato, versão e versão de cada partição, sem ler os dados
+    manifesto = dados._ler_manifesto(caminho) if os.path.isdir(caminho) else {}
+    if manifesto.get('particoes'):
+        pasta = os.path.join(caminho, dados.PASTA_PARTICOES)
+        arquivos = [os.path.join(pasta, p['arquivo']) for _, p in sorted(manifesto['particoes'].items())]
+        particoes = {int(ano): p['token'] for ano, p in manifesto['particoes'].items()}
+        return arquivos, 'ipc', manifesto['versao'], particoes
+
+    arquivos = _arquivos_parquet(caminho)
+    if not arquivos:
+        raise FileNotFoundError(f'Nenhum arquivo Parquet em {caminho}')
+    estados = [(os.path.relpath(a, caminho), os.stat(a).st_size, os.stat(a).st_mtime_ns) for a in arquivos]
+    por_ano = {}
+    for arquivo, estado in zip(arquivos, estados):
+        por_ano.setdefault(_ano(arquivo), []).append(estado)
+    particoes = {ano: _hash(e) for ano, e in por_ano.items() if ano is not None}
+    return arquivos, 'parquet', _hash(estados), particoes
+
+
+def versao(caminho):
+    # Leitura barata usada a cada execução para detectar mudanças no dataset
+    return _descrever(caminho)[2]
+
+
+class BaseExterna:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.arquivos, self.formato, versao_, particoes = _descrever(caminho)
+        self.dataset = ds.dataset(
+            self.arquivos, format=self.formato,
+            partitioning='hive' if self.formato == 'parquet' and os.path.isdir(caminho) else None,
+            partition_base_dir=caminho if os.path.isdir(caminho) else None,
+        )
+        self.columns = pd.Index(self.dataset.schema.names)
+        # Mesmos attrs de uma base em memória: os resultados entram no cache de agregações
+        self.attrs = {'versao': versao_, 'particoes': particoes}
+        self._linhas = None
+        self._conexao = None
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        if self._linhas is None:
+            self._linhas = self.dataset.count_rows()
+        return self._linhas
+
+    def _verificar(self, colunas):
+        ausentes = [c for c in colunas if c not in self.columns]
+        if ausentes:
+            raise KeyError(ausentes)
+
+    def _filtro(self, filtros, obrigatorias=()):
+        # Expressão empurrada para a leitura: partições e row groups fora do filtro nem são lidos
+        expressao = None
+        termos = [ds.field(c).isin(list(v)) for c, v in (filtros or {}).items()]
+        termos += [ds.field(c).is_valid() for c in obrigatorias]
+        for termo in termos:
+            expressao = termo if expressao is None else expressao & termo
+        return expressao
+
+    def lotes(self, colunas, filtros=None, obrigatorias=()):
+        # Lotes só com as colunas pedidas; dicionários decodificados (cada arquivo tem o seu)
+        self._verificar(list(colunas) + list(filtros or {}))
+        scanner = self.dataset.scanner(
+            columns=list(colunas), filter=self._filtro(filtros, obrigatorias), batch_size=LINHAS_LOTE
+        )
+        for lote in scanner.to_batches():
+            if lote.num_rows:
+                yield pa.Table.from_arrays([
+                    coluna.dictionary_decode() if pa.types.is_dictionary(coluna.type) else coluna
+                    for coluna in lote.columns
+                ], names=lote.schema.names)
+
+    def _cursor(self):
+        # Uma conexão por base; cada consulta usa um cursor próprio (sessões rodam em threads)
+        with self._trava:
+            if self._conexao is None:
+                self._conexao = _duckdb().connect(config={'memory_limit': LIMITE_MEMORIA})
+            cursor = self._conexao.cursor()
+        if self.formato == 'parquet':
+            cursor.read_parquet(self.arquivos, hive_partitioning=os.path.isdir(self.caminho)).create_view('base')
+        else:
+            cursor.register('base', self.dataset)
+        return cursor
+
+    def _agrupar_duckdb(self, grupos, medida, agregador, filtros):
+        colunas = ', '.join(f'"{g}"' for g in grupos)
+        condicoes = [f'"{g}" IS NOT NULL' for g in grupos]
+        parametros = []
+        for coluna, valores in (filtros or {}).items():
+            if not valores:
+                # Como no pandas, lista vazia não seleciona nada (IN () não é SQL válido)
+                condicoes.append('FALSE')
+                continue
+            condicoes.append(f'"{coluna}" IN ({", ".join("?" for _ in valores)})')
+            # O DuckDB não recebe escalares do numpy; o float32 vira o double de mesmo valor
+            parametros += [v.item() if isinstance(v, np.generic) else v for v in valores]
+        valor = SQL[agregador].format(f'"{medida}"')
+        sql = f'SELECT {colunas + ", " if grupos else ""}{valor} AS valor FROM base'
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        if grupos:
+            sql += f' GROUP BY {colunas} ORDER BY {colunas}'
+        cursor = self._cursor()
+        try:
+            return cursor.execute(sql, parametros).df()
+        finally:
+            cursor.close()
+
+    def _agrupar_arrow(self, grupos, medida, agregador, filtros):
+        funcoes = PARCIAIS[agregador]
+        chaves = grupos or ['_total']
+
+        def reduzir(tabela, pedidos):
+            resultado = tabela.group_by(chaves).aggregate(pedidos)
+            return resultado.select(chaves + [f'{c}_{f}' for c, f in pedidos]).rename_columns(chaves + funcoes)
+
+        parciais = []
+        for lote in self.lotes(list(dict.fromkeys(grupos + [medida])), filtros, grupos):
+            if not grupos:
+                lote = lote.append_column('_total', pa.array(np.zeros(lote.num_rows, dtype='int8')))
+            parciais.append(reduzir(lote, [(medida, f) for f in funcoes]))
+            if len(parciais) >= PARCIAIS_MAXIMOS:
+                parciais = [reduzir(pa.concat_tables(parciais), [(f, COMBINACAO[f]) for f in funcoes])]
+        if not parciais:
+            resultado = pd.DataFrame(columns=chaves + funcoes)
+        else:
+            resultado = reduzir(pa.concat_tables(parciais), [(f, COMBINACAO[f]) for f in funcoes]).to_pandas()
+        if agregador == 'mean':
+            resultado['valor'] = resultado['sum'] / resultado['count'].where(resultado['count'] > 0)
+        elif agregador == 'sum':
+            resultado['valor'] = resultado['sum'].fillna(0)
+        else:
+            resultado['valor'] = resultado[agregador]
+        return resultado.sort_values(grupos).drop(columns=funcoes + ([] if grupos else ['_total']))
+
+    @medido()
+    def agrupar(self, grupos, medida, agregador='sum', filtros=None):
+        # Equivalente a df[filtros].groupby(grupos, observed=True)[medida].agg(agregador)
+        if agregador not in SQL:
+            raise ValueError(f'Agregador não suportado fora da memória: {agregador}')
+        self._verificar(list(grupos) + [medida] + list(filtros or {}))
+        if _duckdb() is not None:
+            resultado = self._agrupar_duckdb(list(grupos), medida, agregador, filtros)
+        else:
+            resultado = self._agrupar_arrow(list(grupos), medida, agregador, filtros)
+        if not grupos:
+            return resultado['valor'].iloc[0] if len(resultado) else np.nan
+        return resultado.set_index(list(grupos))['valor'].rename(medida)
+
+    @medido()
+    def histograma(self, medidas, faixas):
+        # Contagens por faixa acumuladas lote a lote
+        contagens = {m: np.zeros(len(faixas) - 1, dtype='int64') for m in medidas}
+        for lote in self.lotes(medidas):
+            for medida in medidas:
+                valores = lote.column(medida).to_numpy(zero_copy_only=False).astype('float64')
+                contagens[medida] += np.histogram(valores[~np.isnan(valores)], bins=faixas)[0]
+        return contagens
+
+    @medido()
+    def extremos(self, medidas):
+        # Mínimo e máximo de cada medida, lote a lote
+        extremos = {}
+        for lote in self.lotes(medidas):
+            for medida in medidas:
+                atual = pc.min_max(lote.column(medida)).as_py()
+                if atual['min'] is None:
+                    continue
+                anterior = extremos.get(medida, (atual['min'], atual['max']))
+                extremos[medida] = (min(anterior[0], atual['min']), max(anterior[1], atual['max']))
+        return extremos
+
+    @medido()
+    def amostrar(self, colunas, limite, semente=0):
+        # Amostra de Bernoulli lote a lote com a taxa que dá `limite` linhas em média
+        validas = self.dataset.count_rows(filter=self._filtro(None, colunas))
+        taxa = min(1.0, limite / validas) if validas else 0.0
+        gerador = np.random.default_rng(semente)
+        partes = [
+            lote.filter(pa.array(gerador.random(lote.num_rows) < taxa))
+            for lote in self.lotes(colunas, obrigatorias=colunas)
+        ]
+        if not partes:
+            return pd.DataFrame(columns=colunas)
+        return pa.concat_tables(partes).to_pandas().head(limite)
+
+
+def abrir(caminho):
+    # caminho: pasta Parquet particionada por ano (hive), arquivo Parquet ou a pasta de cache da aplicação
+    return BaseExterna(caminho)
+
+
+def particionar(origem, destino, linhas_por_grupo=LINHAS_LOTE):
+    # Regrava um Parquet (ou pasta de Parquets) particionado por ano, sem carregá-lo em memória
+    ds.write_dataset(
+        ds.dataset(origem, format='parquet'), destino, format='parquet',
+        partitioning=['ano'], partitioning_flavor='hive',
+        max_rows_per_group=linhas_por_grupo, existing_data_behavior='delete_matching',
+    )
+
+
+if __name__ == '__main__':
+    # python -m motor.externo data/sintetica.parquet data/ideb_particionado
+    particionar(sys.argv[1], sys.argv[2])
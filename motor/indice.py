@@ -0,0 +1,105 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from motor import esquema
+
+# Colunas com índice invertido (membro -> linhas)
+INDEXAVEIS = esquema.dimensoes() + esquema.DIMENSAO_TEMPO + ['sigla_uf']
+
+
+def _codigos(serie):
+    # Código inteiro de cada linha (-1 para nulos) e os membros, em ordem crescente
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.array.codes, serie.cat.categories
+    codigos, membros = pd.factorize(serie, sort=True)
+    tipo = np.min_scalar_type(max(len(membros), 1))
+    return codigos.astype(np.result_type(tipo, np.int8)), pd.Index(membros)
+
+
+class IndiceDimensoes:
+    # Para cada coluna, as linhas (int32) agrupadas por membro e em ordem crescente
+    # dentro de cada membro; o trecho de um membro é linhas[inicios[c]:inicios[c + 1]].
+    # As colunas são indexadas na primeira consulta.
+    def __init__(self, df, colunas=()):
+        self.df = df
+        self._colunas = {}
+        self._trava = threading.Lock()
+        for coluna in colunas:
+            self._coluna(coluna)
+
+    def _construir(self, coluna):
+        codigos, membros = _codigos(self.df[coluna])
+        validos = np.flatnonzero(codigos >= 0)
+        contagem = np.bincount(codigos[validos], minlength=len(membros))
+        linhas = validos[np.argsort(codigos[validos], kind='stable')].astype('int32')
+        return {
+            'codigos': codigos,
+            'membros': membros,
+            'inicios': np.concatenate([[0], np.cumsum(contagem)]),
+            'linhas': linhas,
+            'presentes': membros[contagem > 0].tolist(),
+        }
+
+    def _coluna(self, coluna):
+        with self._trava:
+            if coluna not in self._colunas:
+                self._colunas[coluna] = self._construir(coluna)
+            return self._colunas[coluna]
+
+    def indexavel(self, coluna):
+        return coluna in INDEXAVEIS and coluna in self.df.columns
+
+    def membros(self, coluna):
+        # Membros presentes na base, em ordem crescente (para os widgets)
+        return self._coluna(coluna)['presentes']
+
+    def _selecionados(self, coluna, valores):
+        info = self._coluna(coluna)
+        codigos = info['membros'].get_indexer(pd.Index(valores).dropna())
+        return info, np.unique(codigos[codigos >= 0])
+
+    def linhas(self, filtros):
+        # Posições (crescentes) das linhas que passam em todos os filtros {coluna: [valores]}.
+        # Parte do menor conjunto de linhas e o intersecta com as demais colunas
+        # consultando o código de cada linha, sem percorrer a tabela.
+        selecoes = [self._selecionados(coluna, valores) for coluna, valores in filtros.items()]
+        tamanhos = [
+            int((info['inicios'][codigos + 1] - info['inicios'][codigos]).sum()) for info, codigos in selecoes
+        ]
+        ordem = np.argsort(tamanhos, kind='stable')
+        info, codigos = selecoes[ordem[0]]
+        if len(codigos) == 1:
+            resultado = info['linhas'][info['inicios'][codigos[0]]:info['inicios'][codigos[0] + 1]]
+        else:
+            partes = [info['linhas'][info['inicios'][c]:info['inicios'][c + 1]] for c in codigos]
+            resultado = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype='int32')
+        for posicao in ordem[1:]:
+            if not len(resultado):
+                break
+            info, codigos = selecoes[posicao]
+            permitidos = np.zeros(len(info['membros']) + 1, dtype=bool)
+            permitidos[codigos] = True
+            # O código -1 (nulo) cai na última posição, que nunca é permitida
+            resultado = resultado[permitidos[info['codigos'][resultado]]]
+        return resultado
+
+
+_indices = {}
+_trava = threading.Lock()
+
+
+def indice_para(df):
+    # Um índice por versão da base; None para tabelas sem versão.
+    # O tamanho entra na chave porque recortes da base herdam os attrs.
+    versao = df.attrs.get('versao')
+    if versao is None:
+        return None
+    chave = (versao, len(df))
+    with _trava:
+        if chave not in _indices:
+            for antiga in [c for c in _indices if c[0] != versao]:
+                del _indices[antiga]
+            _indices[chave] = IndiceDimensoes(df)
+        return _indices[chave]
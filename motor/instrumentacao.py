@@ -0,0 +1,152 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Medições da execução corrente de cada sessão. Cada execução do script do
+# Streamlit roda numa thread, então o estado fica numa variável local da thread.
+# Desligada (o padrão), cada bloco medido custa só a leitura de um atributo.
+_local = threading.local()
+
+
+class Medida:
+    def __init__(self, nome, linhas=None):
+        self.nome = nome
+        self.linhas = linhas
+        self.enviados = []
+
+    def enviar(self, objeto):
+        # Objeto (tabela ou figura) enviado ao navegador; o tamanho é calculado
+        # depois de encerrada a medição, para não entrar no tempo do bloco
+        self.enviados.append(objeto)
+        return objeto
+
+
+class _MedidaNula:
+    # Usada quando a instrumentação está desligada: não mede nada
+    nome, linhas = None, None
+
+    def enviar(self, objeto):
+        return objeto
+
+
+_NULA = _MedidaNula()
+
+
+def iniciar(ativa):
+    # Chamado no início de cada execução do app: começa uma lista nova de medições
+    _local.registros = [] if ativa else None
+    _local.profundidade = 0
+
+
+def ativa():
+    return getattr(_local, 'registros', None) is not None
+
+
+def registros():
+    return list(getattr(_local, 'registros', None) or [])
+
+
+def _memoria_residente():
+    # Memória residente do processo (Linux); 0 onde /proc não existe
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def tamanho_carga(valor):
+    # Tabelas vão ao navegador em Arrow (st.dataframe) e figuras em JSON (Plotly)
+    import plotly.io
+    import pyarrow as pa
+    if isinstance(valor, pd.Series):
+        valor = valor.to_frame()
+    if isinstance(valor, pd.DataFrame):
+        if not isinstance(valor.index, pd.RangeIndex):
+            valor = valor.reset_index()
+        valor = valor.set_axis([str(c) for c in valor.columns], axis=1)
+        tabela = pa.Table.from_pandas(valor, preserve_index=False)
+        saida = pa.BufferOutputStream()
+        with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        return saida.getvalue().size
+    if isinstance(valor, dict):
+        return sum(tamanho_carga(v) for v in valor.values())
+    if hasattr(valor, 'to_json'):
+        return len(valor.to_json())
+    return len(plotly.io.json.to_json_plotly(valor))
+
+
+@contextmanager
+def medir(nome, linhas=None):
+    # with medir('cubo.pivot', len(df)) as m: ...; m.enviar(tabela)
+    if not ativa():
+        yield _NULA
+        return
+    medida = Medida(nome, linhas)
+    _local.profundidade += 1
+    relogio = time.time()
+    memoria, cpu, inicio = _memoria_residente(), time.thread_time(), time.perf_counter()
+    try:
+        yield medida
+    finally:
+        segundos, cpu = time.perf_counter() - inicio, time.thread_time() - cpu
+        _local.profundidade -= 1
+        _local.registros.append({
+            'nome': medida.nome,
+            'nivel': _local.profundidade,
+            'inicio': relogio,
+            'segundos': segundos,
+            'cpu_segundos': cpu,
+            'linhas': medida.linhas,
+            'memoria_delta': _memoria_residente() - memoria,
+            'carga_bytes': sum(tamanho_carga(o) for o in medida.enviados) if medida.enviados else None,
+        })
+
+
+def exibir(nome, funcao, objeto, *args, **kwargs):
+    # exibir('cubo.pivot', st.dataframe, tabela, ...): mede a serialização e o envio ao navegador
+    with medir(nome, len(objeto) if isinstance(objeto, pd.DataFrame) else None) as medida:
+        return funcao(medida.enviar(objeto), *args, **kwargs)
+
+
+def medido(nome=None):
+    # Decorador: mede a função; as linhas são as do DataFrame passado como 1º argumento
+    def decorar(funcao):
+        rotulo = nome or f'{funcao.__module__}.{funcao.__name__}'
+
+        @functools.wraps(funcao)
+        def envolver(*args, **kwargs):
+            if not ativa():
+                return funcao(*args, **kwargs)
+            linhas = len(args[0]) if args and isinstance(args[0], pd.DataFrame) else None
+            with medir(rotulo, linhas):
+                return funcao(*args, **kwargs)
+        return envolver
+    return decorar
+
+
+def tabela():
+    # Medições da execução corrente, na ordem em que terminaram
+    return pd.DataFrame(registros(), columns=[
+        'nome', 'nivel', 'inicio', 'segundos', 'cpu_segundos', 'linhas', 'memoria_delta', 'carga_bytes'
+    ])
+
+
+def exportar(caminho, pagina=None):
+    # Acrescenta as medições da execução a um arquivo JSON lines
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(jsonl(pagina))
+
+
+def jsonl(pagina=None):
+    # Uma linha JSON por medição, para exportação
+    return ''.join(
+        json.dumps({'pagina': pagina, **registro}, ensure_ascii=False, default=str) + '\n'
+        for registro in registros()
+    )
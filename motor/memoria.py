@@ -0,0 +1,67 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def _valores(serie):
+    # Buffer que guarda os dados da coluna (códigos no caso de categorias)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.array.codes
+    return serie.to_numpy()
+
+
+def uso_memoria(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _bytes_sem_otimizacao(serie):
+    # Bytes da coluna como uma leitura sem tipos (strings Python, int64, float64);
+    # para categorias é calculado pelos códigos, sem materializar as strings
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        tamanhos = np.array([sys.getsizeof(np.nan)] + [sys.getsizeof(c) for c in serie.cat.categories])
+        contagem = np.bincount(serie.array.codes.astype('int64') + 1, minlength=len(tamanhos))
+        return int(8 * len(serie) + (contagem * tamanhos).sum())
+    if serie.dtype == bool or serie.dtype == 'boolean':
+        return len(serie)
+    if serie.dtype.kind in 'iuf':
+        return 8 * len(serie)
+    return int(serie.memory_usage(deep=True, index=False))
+
+
+def relatorio_tipos(df):
+    # Memória de cada coluna com os tipos do esquema e como seria sem a conversão
+    relatorio = pd.DataFrame([
+        [coluna, str(df[coluna].dtype), int(df[coluna].memory_usage(deep=True, index=False)),
+         _bytes_sem_otimizacao(df[coluna])]
+        for coluna in df.columns
+    ], columns=['coluna', 'tipo', 'bytes', 'bytes_sem_otimizacao'])
+    relatorio['reducao'] = (relatorio['bytes_sem_otimizacao'] / relatorio['bytes'].clip(lower=1)).round(1)
+    return relatorio
+
+
+def bytes_proprios(df, base):
+    # Bytes de df que não são apenas visões das colunas da base compartilhada
+    total = int(df.index.memory_usage(deep=True))
+    for coluna in df.columns:
+        serie = df[coluna]
+        if coluna in base.columns and len(serie) == len(base) and \
+                np.may_share_memory(_valores(serie), _valores(base[coluna])):
+            continue
+        total += int(serie.memory_usage(deep=True, index=False))
+    return total
+
+
+def relatorio_sessao(estado, base):
+    # Antes cada sessão recebia uma cópia completa da base (st.cache_data)
+    linhas = []
+    for chave, valor in estado.items():
+        if isinstance(valor, pd.DataFrame):
+            linhas.append([chave, len(valor), bytes_proprios(valor, base)])
+    relatorio = pd.DataFrame(linhas, columns=['chave', 'linhas', 'bytes_proprios'])
+    return {
+        'base_compartilhada': uso_memoria(base),
+        'antes_por_sessao': uso_memoria(base),
+        'agora_por_sessao': int(relatorio['bytes_proprios'].sum()),
+        'detalhe': relatorio,
+    }
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from motor.agregacao import CacheLRU
+from motor.instrumentacao import medido
+
+PASTA_MODELOS = os.path.join('data', 'cache', 'modelos')
+PROCESSOS = max(1, (os.cpu_count() or 2) - 1)
+# Linhas por bloco no agrupamento em mini-batch
+TAMANHO_BLOCO = 10_000
+
+# Resultados dos modelos já treinados, compartilhados entre as sessões
+resultados = CacheLRU(limite_bytes=64 * 1024 * 1024)
+# Erros dos treinos que falharam, pela mesma chave: não são submetidos de novo a cada rerun
+erros = CacheLRU(limite_bytes=1024 * 1024)
+_tarefas = {}
+_trava = threading.RLock()
+_pool = None
+
+
+class _Processo(multiprocessing.context.SpawnProcess):
+    # Sob o Streamlit, sys.modules['__main__'] é o script da página (app.py, sem
+    # __spec__) e o spawn o executaria de novo em cada processo do pool. Enquanto o
+    # processo é criado, o __main__ é um módulo vazio: o filho só importa o motor.
+    @staticmethod
+    def _Popen(processo):
+        principal, vazio = sys.modules['__main__'], types.ModuleType('__main__')
+        sys.modules['__main__'] = vazio
+        try:
+            return multiprocessing.context.SpawnProcess._Popen(processo)
+        finally:
+            if sys.modules.get('__main__') is vazio:
+                sys.modules['__main__'] = principal
+
+
+class _Contexto(multiprocessing.context.SpawnContext):
+    Process = _Processo
+
+
+def _executor():
+    # spawn: o processo do Streamlit tem várias threads, fork não é seguro
+    global _pool
+    with _trava:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS, mp_context=_Contexto())
+        return _pool
+
+
+def _descartar_executor():
+    # Pool quebrado (um processo morreu): o próximo pedido cria outro
+    global _pool
+    with _trava:
+        if _pool is not None and _pool._broken:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _submeter(funcao, *argumentos):
+    # Um pool quebrado é trocado por outro antes de desistir
+    try:
+        return _executor().submit(funcao, *argumentos)
+    except BrokenProcessPool:
+        _descartar_executor()
+        return _executor().submit(funcao, *argumentos)
+
+
+def chave(tipo, versao, alvo, atributos, parametros):
+    texto = json.dumps([tipo, versao, alvo, list(atributos), parametros], sort_keys=True, default=str)
+    return f'{tipo}-{hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]}'
+
+
+def codificar(df, colunas):
+    # Atributos numéricos para os modelos: categorias pelos códigos e texto pelo LabelEncoder
+    codificado = df[list(colunas)]  # Projeção: só as colunas codificadas são materializadas
+    for coluna in colunas:
+        if isinstance(codificado[coluna].dtype, pd.CategoricalDtype):
+            codificado[coluna] = codificado[coluna].cat.codes
+        elif codificado[coluna].dtype == 'object':
+            from sklearn.preprocessing import LabelEncoder
+            codificado[coluna] = LabelEncoder().fit_transform(codificado[coluna])
+    return codificado
+
+
+def _dividir(X, y):
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, y, test_size=0.3, random_state=42)
+
+
+def _blocos(X, tamanho=TAMANHO_BLOCO):
+    # Percorre a base em blocos, sem copiar a matriz inteira
+    matriz = np.asarray(X, dtype='float64') if not isinstance(X, np.ndarray) else X
+    for inicio in range(0, len(matriz), tamanho):
+        yield matriz[inicio:inicio + tamanho]
+
+
+def _gravar_dados(versao, alvo, atributos, X, y):
+    # X e y vão para o pool uma vez por (versão, alvo, atributos), em .npy; os treinos
+    # recebem só os caminhos, e a varredura do KMeans não serializa a base nove vezes
+    matrizes = {'X': np.asarray(X, dtype='float64')}
+    if y is not None:
+        matrizes['y'] = np.asarray(y)
+    if versao is None:
+        # Base sem versão: a chave sai do conteúdo
+        versao = hashlib.sha1(b''.join(np.ascontiguousarray(m).tobytes() for m in matrizes.values())).hexdigest()
+    prefixo = os.path.join(PASTA_MODELOS, 'dados', chave('dados', versao, alvo, atributos, None))
+    caminhos = {}
+    for nome, matriz in matrizes.items():
+        caminho = f'{prefixo}-{nome}.npy'
+        if not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f'{prefixo}-{nome}.{os.getpid()}-{threading.get_ident()}.tmp.npy'
+            np.save(temporario, matriz, allow_pickle=False)
+            os.replace(temporario, caminho)
+        caminhos[nome] = caminho
+    return caminhos['X'], caminhos.get('y')
+
+
+def _treinar_arquivos(tipo, parametros, caminho_X, caminho_y, destino):
+    # Executado num processo do pool: abre as matrizes com memory map, sem copiá-las
+    X = np.load(caminho_X, mmap_mode='r')
+    y = np.load(caminho_y, mmap_mode='r') if caminho_y else None
+    return _treinar(tipo, parametros, X, y, destino)
+
+
+def _treinar(tipo, parametros, X, y, destino):
+    # Executado num processo do pool: importa o sklearn só aqui
+    if tipo == 'linear':
+        from sklearn.linear_model import LinearRegression
+        from sklearn.metrics import mean_squared_error
+        X_train, X_test, y_train, y_test = _dividir(X, y)
+        modelo = LinearRegression(**parametros).fit(X_train, y_train)
+        previsto = modelo.predict(X_test)
+        resultado = {'mse': mean_squared_error(y_test, previsto), 'real': y_test, 'previsto': previsto}
+    elif tipo in ('logistica', 'arvore'):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.metrics import accuracy_score
+        from sklearn.tree import DecisionTreeClassifier
+        X_train, X_test, y_train, y_test = _dividir(X, y)
+        classe = LogisticRegression if tipo == 'logistica' else DecisionTreeClassifier
+        modelo = classe(**parametros).fit(X_train, y_train)
+        previsto = modelo.predict(X_test)
+        resultado = {'precisao': accuracy_score(y_test, previsto), 'real': y_test, 'previsto': previsto}
+    elif tipo == 'kmeans':
+        from sklearn.cluster import KMeans
+        modelo = KMeans(**parametros)
+        rotulos = modelo.fit_predict(X)
+        resultado = {'inercia': modelo.inertia_, 'rotulos': rotulos}
+    elif tipo == 'kmeans_lote':
+        from sklearn.cluster import MiniBatchKMeans
+        parametros = dict(parametros)
+        passadas = parametros.pop('passadas', 3)
+        modelo = MiniBatchKMeans(**parametros)
+        for _ in range(passadas):
+            for bloco in _blocos(X):
+                if len(bloco) >= modelo.n_clusters:
+                    modelo.partial_fit(bloco)
+        # Rótulos e inércia também calculados bloco a bloco
+        rotulos = np.concatenate([modelo.predict(bloco) for bloco in _blocos(X)])
+        inercia = -sum(modelo.score(bloco) for bloco in _blocos(X))
+        resultado = {'inercia': inercia, 'rotulos': rotulos}
+    elif tipo == 'pca':
+        from sklearn.decomposition import PCA
+        modelo = PCA(**parametros)
+        componentes = modelo.fit_transform(X)
+        resultado = {'variancia': modelo.explained_variance_ratio_, 'componentes': componentes}
+    else:
+        raise ValueError(f'Modelo desconhecido: {tipo}')
+
+    import joblib
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    joblib.dump({'modelo': modelo, 'resultado': resultado}, destino + '.tmp')
+    os.replace(destino + '.tmp', destino)
+    return resultado
+
+
+def _arquivo(identificador):
+    return os.path.join(PASTA_MODELOS, identificador + '.joblib')
+
+
+@medido()
+def solicitar(tipo, versao, alvo, atributos, parametros, X, y=None):
+    # Devolve a chave do modelo; o treino, se necessário, roda fora da thread do Streamlit
+    identificador = chave(tipo, versao, alvo, atributos, parametros)
+    with _trava:
+        if identificador in _tarefas:
+            # Em andamento ou concluída: resultado() entrega o valor ou o erro
+            return identificador
+    try:
+        pronto = resultado(identificador) is not None
+    except BrokenProcessPool:
+        pronto = False
+    except Exception:
+        # Falhou antes com os mesmos dados: resultado() devolve o erro guardado
+        return identificador
+    if not pronto:
+        caminho_X, caminho_y = _gravar_dados(versao, alvo, atributos, X, y)
+        with _trava:
+            if identificador not in _tarefas:
+                # Caminhos absolutos: os processos do pool mantêm a pasta em que foram criados
+                _tarefas[identificador] = _submeter(
+                    _treinar_arquivos, tipo, parametros, os.path.abspath(caminho_X),
+                    caminho_y and os.path.abspath(caminho_y), os.path.abspath(_arquivo(identificador)),
+                )
+    return identificador
+
+
+@medido()
+def resultado(identificador):
+    # None enquanto o modelo ainda está sendo treinado (ou se nunca foi pedido);
+    # levanta o erro do treino que falhou
+    with _trava:
+        tarefa = _tarefas.get(identificador)
+        if tarefa is not None:
+            if not tarefa.done():
+                return None
+            del _tarefas[identificador]
+    if tarefa is not None:
+        if isinstance(tarefa.exception(), BrokenProcessPool):
+            # Falha do pool, não do treino: nada fica guardado e o próximo pedido treina de novo
+            _descartar_executor()
+            raise tarefa.exception()
+        if tarefa.exception() is not None:
+            erros.guardar(identificador, tarefa.exception())
+        else:
+            resultados.guardar(identificador, tarefa.result())
+    erro = erros.consultar(identificador)
+    if erro is not None:
+        raise erro
+    valor = resultados.consultar(identificador)
+    if valor is None and os.path.exists(_arquivo(identificador)):
+        # Modelo persistido por outro processo ou antes de um reinício
+        import joblib
+        valor = joblib.load(_arquivo(identificador))['resultado']
+        resultados.guardar(identificador, valor)
+    return valor
+
+
+def pendentes(identificadores):
+    with _trava:
+        return [i for i in identificadores if i in _tarefas and not _tarefas[i].done()]
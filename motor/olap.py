@@ -0,0 +1,185 @@
+import itertools
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from motor import esquema, execucao
+from motor.instrumentacao import medido
+
+# Níveis da hierarquia geográfica; cada nível carrega os níveis acima dele.
+# No nível do município entram também os demais recortes territoriais,
+# que dependem só do município e por isso não aumentam o número de grupos.
+HIERARQUIA_GEO = [
+    [],
+    ['nome_regiao'],
+    ['nome_regiao', 'nome_uf'],
+    ['nome_regiao', 'nome_uf', 'nome_regiao_intermediaria', 'nome_regiao_imediata', 'nome_mesorregiao',
+     'nome_microrregiao', 'nome_regiao_saude', 'nome_regiao_metropolitana', 'amazonia_legal', 'cidade'],
+]
+DIMENSOES_CUBO = ['rede', 'ensino', 'ano']
+# Chaves extras mantidas só no cuboide base (o mais detalhado)
+DIMENSOES_BASE = ['anos_escolares']
+
+# Agregados parciais e como cada um é reagregado num roll-up
+PARCIAIS = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def parcial(medida, agregador):
+    # Nome da coluna que guarda o agregado parcial de uma medida no cuboide
+    return f'{medida}|{agregador}'
+
+
+def _agrupar(df, chaves, origem):
+    # origem: {coluna do cuboide: (coluna de df, função de agregação)}
+    funcoes = list(dict.fromkeys(f for _, f in origem.values()))
+    destinos = [[d for d, (_, f) in origem.items() if f == funcao] for funcao in funcoes]
+    pedidos = [(funcao, [origem[d][0] for d in destino]) for funcao, destino in zip(funcoes, destinos)]
+    if chaves:
+        partes = execucao.agrupar_varios(df, chaves, pedidos, dropna=False)
+    else:
+        partes = execucao.agrupar_varios(df.assign(_total=np.int8(0)), ['_total'], pedidos)
+    for parte, destino in zip(partes, destinos):
+        parte.columns = destino
+    resultado = pd.concat(partes, axis=1)[list(origem)]
+    return resultado.reset_index(drop=not chaves)
+
+
+def _alinhar_categorias(cuboide, df):
+    # Usa as categorias da base nova para que a concatenação continue categórica
+    alinhado = cuboide.copy(deep=False)
+    for coluna in alinhado.columns:
+        if coluna in df.columns and isinstance(alinhado[coluna].dtype, pd.CategoricalDtype):
+            alinhado[coluna] = alinhado[coluna].cat.set_categories(df[coluna].cat.categories)
+    return alinhado
+
+
+class Cubo:
+    def __init__(self, df, medidas=None):
+        self.medidas = [m for m in (medidas or esquema.MEDIDA) if m in df.columns]
+        self.df = df
+        self.cuboides = {}
+        self._materializar()
+
+    def _materializar(self):
+        geo_base = [c for c in HIERARQUIA_GEO[-1] if c in self.df.columns]
+        base = geo_base + [c for c in DIMENSOES_CUBO + DIMENSOES_BASE if c in self.df.columns]
+        fato = self.df[base + self.medidas].copy()
+        for medida in self.medidas:
+            # Somas parciais em float64 para não perder precisão no roll-up
+            fato[medida] = fato[medida].astype('float64')
+        origem = {parcial(m, p): (m, p) for m in self.medidas for p in PARCIAIS}
+        self.cuboides[tuple(base)] = _agrupar(fato, base, origem)
+
+        # Do cuboide mais detalhado para o menor, sempre a partir do menor ancestral
+        reticulado = []
+        for geo in HIERARQUIA_GEO:
+            geo = [c for c in geo if c in self.df.columns]
+            for n in range(len(DIMENSOES_CUBO), -1, -1):
+                for outras in itertools.combinations(DIMENSOES_CUBO, n):
+                    chaves = geo + [c for c in outras if c in self.df.columns]
+                    reticulado.append(tuple(chaves))
+        for chaves in sorted(set(reticulado), key=len, reverse=True):
+            if chaves not in self.cuboides:
+                self.cuboides[chaves] = self._rollup(self._ancestral(chaves), list(chaves))
+
+    def _ancestral(self, chaves):
+        # Menor cuboide materializado que contém todas as chaves pedidas
+        candidatos = [c for c in self.cuboides if set(chaves) <= set(c)]
+        if not candidatos:
+            return None
+        return self.cuboides[min(candidatos, key=lambda c: len(self.cuboides[c]))]
+
+    def _rollup(self, cuboide, chaves):
+        origem = {parcial(m, p): (parcial(m, p), f) for m in self.medidas for p, f in PARCIAIS.items()}
+        return _agrupar(cuboide, chaves, origem)
+
+    def acrescentar(self, df, anos):
+        # Novo cubo para a base com as edições `anos` acrescentadas, agregando só essas linhas
+        if set(anos) & set(self.df['ano'].unique()):
+            # Edição substituída: min/max não podem ser desfeitos, reconstrói tudo
+            return Cubo(df, self.medidas)
+        delta = Cubo(df[df['ano'].isin(anos)], self.medidas)
+        novo = Cubo.__new__(Cubo)
+        novo.medidas, novo.df, novo.cuboides = self.medidas, df, {}
+        for chaves, cuboide in self.cuboides.items():
+            combinado = pd.concat(
+                [_alinhar_categorias(cuboide, df), delta.cuboides[chaves]], ignore_index=True
+            )
+            if 'ano' not in chaves:
+                combinado = self._rollup(combinado, list(chaves))
+            novo.cuboides[chaves] = combinado
+        return novo
+
+    def consultar(self, grupos, medida, agregador='sum'):
+        # Resultado equivalente a df.groupby(grupos)[medida].agg(agregador)
+        grupos = list(grupos)
+        cuboide = self._ancestral(grupos)
+        if cuboide is None:
+            # Dimensão fora do reticulado: agrega direto da tabela fato
+            serie = self.df[medida].astype('float64')
+            return serie.groupby([self.df[g] for g in grupos], observed=True).agg(agregador)
+
+        grupos_cuboide = cuboide.groupby(grupos, observed=True)
+        if agregador == 'mean':
+            somas = grupos_cuboide[[parcial(medida, 'sum'), parcial(medida, 'count')]].sum()
+            contagem = somas[parcial(medida, 'count')]
+            resultado = somas[parcial(medida, 'sum')] / contagem.where(contagem > 0)
+        elif agregador in PARCIAIS:
+            resultado = grupos_cuboide[parcial(medida, agregador)].agg(PARCIAIS[agregador])
+        else:
+            raise ValueError(f'Agregador não decomponível: {agregador}')
+        return resultado.rename(medida)
+
+    def pivotar(self, linhas, colunas, medida, agregador='sum', fill_value=0):
+        # Equivalente a pivot_table(index=linhas, columns=colunas, values=medida, aggfunc=agregador)
+        resultado = self.consultar(list(linhas) + list(colunas), medida, agregador)
+        tabela = resultado.unstack(list(range(len(linhas), len(linhas) + len(colunas))))
+        if fill_value is not None:
+            tabela = tabela.fillna(fill_value)
+        return tabela
+
+
+# Um Future por versão: quem pede o cubo enquanto outra thread (o pré-aquecimento ou
+# outra sessão) o constrói espera pelo mesmo resultado em vez de construir outro
+_cubos = {}
+_trava = threading.Lock()
+
+
+def _anterior(futuro):
+    # Cubo da versão anterior, esperando se ainda está em construção; None se não há ou falhou
+    if futuro is None or futuro.exception() is not None:
+        return None
+    return futuro.result()
+
+
+@medido()
+def cubo_para(df):
+    # Um cubo por versão da base. Depois da ingestão de novas edições o cubo
+    # anterior é estendido só com as partições novas, sem reagregar a base inteira.
+    versao = df.attrs.get('versao')
+    if versao is None:
+        return Cubo(df)
+    with _trava:
+        futuro = _cubos.get(versao)
+        construir = futuro is None
+        if construir:
+            anterior = _cubos.get(df.attrs.get('versao_anterior')) if df.attrs.get('anos_novos') else None
+            futuro = _cubos[versao] = Future()
+    if not construir:
+        return futuro.result()
+    try:
+        anterior = _anterior(anterior)
+        cubo = anterior.acrescentar(df, df.attrs['anos_novos']) if anterior is not None else Cubo(df)
+    except BaseException as erro:
+        # A próxima chamada tenta de novo; quem estava esperando recebe o erro
+        with _trava:
+            _cubos.pop(versao, None)
+        futuro.set_exception(erro)
+        raise
+    futuro.set_result(cubo)
+    with _trava:
+        for antiga in [v for v in _cubos if v != versao]:
+            del _cubos[antiga]
+    return cubo
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from motor import agregacao
+from motor.instrumentacao import medido
+
+# Colunas com ordem pré-calculada (as demais são ordenadas sob demanda e memorizadas)
+ORDENAVEIS = ['ano', 'sigla_uf', 'nome_regiao', 'nome_uf', 'cidade', 'rede', 'ensino', 'anos_escolares']
+# Dimensões oferecidas como filtro na tabela
+FILTRAVEIS = ['ano', 'nome_regiao', 'nome_uf', 'rede', 'ensino', 'anos_escolares']
+
+
+def _ordem_crescente(serie):
+    # Posições das linhas em ordem crescente (nulos no fim) e quantidade de não nulos
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        chaves = serie.array.codes.astype('int64')
+    elif serie.dtype.kind in 'biuf':
+        chaves = serie.to_numpy(dtype='float64')
+    else:
+        chaves, _ = pd.factorize(serie, sort=True)
+    if chaves.dtype.kind == 'i':
+        chaves = np.where(chaves < 0, np.iinfo('int64').max, chaves)
+    return np.argsort(chaves, kind='stable'), int(serie.notna().sum())
+
+
+class IndicesOrdenacao:
+    def __init__(self, df, colunas=ORDENAVEIS):
+        self.df = df
+        self._ordens = {}
+        for coluna in colunas:
+            if coluna in df.columns:
+                self._ordens[coluna] = _ordem_crescente(df[coluna])
+
+    def ordem(self, coluna, crescente=True):
+        if coluna not in self._ordens:
+            self._ordens[coluna] = _ordem_crescente(self.df[coluna])
+        posicoes, validos = self._ordens[coluna]
+        if crescente:
+            return posicoes
+        # Decrescente mantendo os nulos no fim
+        return np.concatenate([posicoes[:validos][::-1], posicoes[validos:]])
+
+
+@medido()
+def posicoes(df, filtros=None, indices=None, ordem=None, crescente=True):
+    # Posições (iloc) das linhas que passam nos filtros, já na ordem pedida
+    if ordem is None:
+        return agregacao.linhas(df, filtros) if filtros else np.arange(len(df))
+    selecionadas = agregacao.mascara(df, filtros) if filtros else None
+    ordenadas = indices.ordem(ordem, crescente)
+    return ordenadas[selecionadas[ordenadas]] if selecionadas is not None else ordenadas
+
+
+def pagina(df, linhas, numero, tamanho, colunas=None):
+    # Só a fatia da página é materializada e enviada ao navegador
+    inicio = (numero - 1) * tamanho
+    fatia = df.iloc[linhas[inicio:inicio + tamanho]]
+    return fatia[colunas] if colunas else fatia
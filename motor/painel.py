@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+
+from motor import agregacao, esquema, olap
+from motor.instrumentacao import medido
+
+# Fonte de dados do painel (PyGWalker): em vez das linhas da base, uma tabela já
+# agregada até a granularidade territorial escolhida, só com as colunas do painel.
+# Cada medida vem como média do grupo e número de registros válidos (<medida>_n),
+# para que o explorador possa reagregar com a média ponderada.
+GRANULARIDADES = {'UF': 'uf', 'Mesorregião': 'mesorregiao', 'Município': 'municipio'}
+GEO = {
+    'uf': ['nome_regiao', 'nome_uf'],
+    'mesorregiao': ['nome_regiao', 'nome_uf', 'nome_mesorregiao'],
+    # No município entram todos os recortes territoriais, que não aumentam o número de grupos
+    'municipio': olap.HIERARQUIA_GEO[-1],
+}
+DIMENSOES = ['rede', 'ensino', 'anos_escolares', 'ano']
+SUFIXO_CONTAGEM = '_n'
+# Configuração dos gráficos publicada para cada versão da base e granularidade
+# (<versao>/<granularidade>.json, exportada do explorador); o painel só a lê
+PASTA_SPEC = os.path.join('data', 'cache', 'painel')
+
+
+def dimensoes(df, granularidade):
+    return [c for c in GEO[granularidade] + DIMENSOES if c in df.columns]
+
+
+@medido()
+def tabela(df, granularidade):
+    # Agregados lidos do cubo (ou do dataset, para bases fora da memória), um por medida
+    grupos = dimensoes(df, granularidade)
+    cubo = olap.cubo_para(df) if isinstance(df, pd.DataFrame) else None
+    colunas = []
+    for medida in [m for m in esquema.MEDIDA if m in df.columns]:
+        colunas.append(agregacao.agregar(df, grupos, medida, 'mean', cubo=cubo).rename(medida))
+        colunas.append(
+            agregacao.agregar(df, grupos, medida, 'count', cubo=cubo).rename(medida + SUFIXO_CONTAGEM)
+        )
+    resultado = pd.concat(colunas, axis=1).reset_index()
+    contagens = [c for c in resultado.columns if c.endswith(SUFIXO_CONTAGEM)]
+    resultado[contagens] = resultado[contagens].fillna(0).astype('int64')
+    return resultado
+
+
+def spec(versao, granularidade):
+    # Caminho da configuração desta versão, ou '' (gráficos em branco) se não foi publicada:
+    # as colunas mudam entre versões e uma configuração antiga não vale para a nova
+    caminho = os.path.join(PASTA_SPEC, str(versao), f'{granularidade}.json')
+    return caminho if versao is not None and os.path.exists(caminho) else ''
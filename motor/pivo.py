@@ -0,0 +1,123 @@
+import math
+
+import pandas as pd
+
+from motor import agregacao, olap
+from motor.instrumentacao import medido
+
+# Maior pivô denso (linhas x colunas) montado de uma vez para a página Cubo
+LIMITE_CELULAS = 200_000
+# Rótulo dos membros recolhidos fora do top-N
+OUTROS = 'Outros'
+# Como cada agregado parcial é reagregado ao recolher membros
+COMBINACAO = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def cardinalidade(df, coluna):
+    # Número de membros da coluna: de graça para categorias, senão uma contagem memorizada
+    if isinstance(df, pd.DataFrame) and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+        return len(df[coluna].cat.categories)
+    if isinstance(df, pd.DataFrame) and df[coluna].dtype == bool:
+        return 2
+    return len(agregacao.agregar(df, [coluna], coluna, 'count'))
+
+
+def _combinacoes(df, dimensoes):
+    # Limite superior para o número de combinações distintas das dimensões.
+    # Os recortes territoriais dependem só do município: juntos não passam do número de municípios.
+    if not dimensoes:
+        return 1
+    geo = [d for d in dimensoes if d in olap.HIERARQUIA_GEO[-1]]
+    outras = [d for d in dimensoes if d not in geo]
+    total = math.prod(cardinalidade(df, d) for d in outras)
+    if geo:
+        produto = math.prod(cardinalidade(df, d) for d in geo)
+        if 'id_municipio' in df.columns:
+            produto = min(produto, cardinalidade(df, 'id_municipio'))
+        total *= produto
+    return min(total, len(df))
+
+
+@medido()
+def estimar(df, linhas, colunas):
+    # Tamanho do pivô estimado só a partir do número de membros, antes de agregar
+    n_linhas, n_colunas = _combinacoes(df, linhas), _combinacoes(df, colunas)
+    return {
+        'linhas': n_linhas,
+        'colunas': n_colunas,
+        'celulas': n_linhas * n_colunas,
+        # Células não vazias (o formato longo) nunca passam do número de linhas da base
+        'grupos': min(n_linhas * n_colunas, _combinacoes(df, list(linhas) + list(colunas))),
+        'densa': n_linhas * n_colunas <= LIMITE_CELULAS,
+    }
+
+
+def longo(df, linhas, colunas, medida, agregador='sum', cubo=None):
+    # Formato longo: só as combinações não vazias, uma por linha
+    return agregacao.agregar(df, list(linhas) + list(colunas), medida, agregador, cubo=cubo).reset_index()
+
+
+def _principais(df, dimensoes, medida, agregador, n, cubo):
+    # Chaves das n combinações com maior valor agregado, em ordem decrescente
+    ranking = agregacao.agregar(df, dimensoes, medida, agregador, cubo=cubo)
+    principais = ranking.nlargest(n).index
+    if not isinstance(principais, pd.MultiIndex):
+        principais = pd.MultiIndex.from_arrays([principais])
+    return principais
+
+
+def _recolher(tabela, dimensoes, principais):
+    # Combinações fora das principais passam a valer OUTROS em todas as dimensões
+    fora = ~pd.MultiIndex.from_frame(tabela[dimensoes]).isin(principais)
+    if fora.any():
+        tabela = tabela.astype({d: 'object' for d in dimensoes})
+        tabela.loc[fora, dimensoes] = OUTROS
+    return tabela
+
+
+def _ordenar(tabela, principais):
+    # Principais na ordem do ranking e OUTROS por último
+    ordem = list(principais) + [tuple([OUTROS] * principais.nlevels)]
+    if tabela.index.nlevels == 1:
+        ordem = [chave[0] for chave in ordem]
+    return tabela.reindex([chave for chave in ordem if chave in tabela.index])
+
+
+@medido()
+def principais(df, linhas, colunas, medida, agregador='sum', n_linhas=50, n_colunas=20, fill_value=0, cubo=None):
+    # Pivô denso só com as n_linhas x n_colunas combinações de maior valor; as demais
+    # são recolhidas em OUTROS a partir de agregados decomponíveis, sem reler a base
+    linhas, colunas = list(linhas), list(colunas)
+    grupos = linhas + colunas
+    parciais = ['sum', 'count'] if agregador == 'mean' else [agregador]
+    if any(p not in COMBINACAO for p in parciais):
+        raise ValueError(f'Agregador não decomponível: {agregador}')
+    tabela = pd.concat(
+        [agregacao.agregar(df, grupos, medida, p, cubo=cubo).rename(p) for p in parciais], axis=1
+    ).reset_index()
+
+    chaves_linhas = _principais(df, linhas, medida, agregador, n_linhas, cubo)
+    chaves_colunas = _principais(df, colunas, medida, agregador, n_colunas, cubo)
+    tabela = _recolher(_recolher(tabela, linhas, chaves_linhas), colunas, chaves_colunas)
+    tabela = tabela.groupby(grupos, observed=True).agg({p: COMBINACAO[p] for p in parciais})
+    if agregador == 'mean':
+        valor = tabela['sum'] / tabela['count'].where(tabela['count'] > 0)
+    else:
+        valor = tabela[agregador]
+
+    pivo = valor.rename(medida).unstack(list(range(len(linhas), len(grupos))))
+    pivo = _ordenar(pivo, chaves_linhas)
+    pivo = _ordenar(pivo.T, chaves_colunas).T
+    if fill_value is not None:
+        pivo = pivo.fillna(fill_value)
+    return pivo
+
+
+def paginas(total, tamanho):
+    return max(1, -(-total // tamanho))
+
+
+def pagina(tabela, numero, tamanho):
+    # Só a fatia da página vai para o navegador
+    inicio = (numero - 1) * tamanho
+    return tabela.iloc[inicio:inicio + tamanho]
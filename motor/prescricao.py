@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from motor import agregacao
+from motor.instrumentacao import medido
+
+# Alocação de orçamento por grupo (região, UF ou município). Em cada grupo g:
+#   max Σ peso[g, nota] · recurso[g, nota]   sujeito a   Σ recurso[g, nota] <= orçamento[g], recurso >= 0
+# com peso = correlação da nota com o alvo no grupo x impacto.
+# A base não identifica escolas (cada linha é município x rede x etapa x edição): a divisão
+# proporcional usa o número de registros do grupo
+DIVISOES = {'Igual': 'igual', 'Proporcional ao número de registros': 'registros'}
+ROTULO_BRASIL = 'Brasil'
+
+
+def _colunas(grupos):
+    # Municípios homônimos de UFs diferentes são grupos distintos: a cidade vem com a UF
+    colunas = []
+    for grupo in grupos:
+        if grupo == 'cidade' and 'sigla_uf' not in grupos:
+            colunas.append('sigla_uf')
+        colunas.append(grupo)
+    return colunas
+
+
+def _codigos(df, grupos):
+    # Código do grupo de cada linha (-1 para chaves nulas) e as chaves, em ordem
+    if not grupos:
+        return np.zeros(len(df), dtype='int64'), pd.Index([ROTULO_BRASIL], name='grupo')
+    agrupamento = df.groupby(_colunas(grupos), observed=True, sort=True)
+    codigos = agrupamento.ngroup().to_numpy(dtype='float64', na_value=-1).astype('int64')
+    return codigos, agrupamento.size().index
+
+
+def _correlacoes(df, grupos, notas, alvo):
+    # Pearson de cada nota com o alvo em todos os grupos de uma vez: as somas de
+    # cada grupo saem de np.bincount sobre o código do grupo (pares completos, como DataFrame.corr)
+    codigos, chaves = _codigos(df, grupos)
+    validos_grupo = codigos >= 0
+    total = len(chaves)
+    y = df[alvo].to_numpy(dtype='float64', na_value=np.nan)
+
+    def somar(pesos, linhas):
+        return np.bincount(codigos[linhas], weights=pesos[linhas], minlength=total)
+
+    correlacao = {}
+    for nota in notas:
+        x = df[nota].to_numpy(dtype='float64', na_value=np.nan)
+        linhas = validos_grupo & ~np.isnan(x) & ~np.isnan(y)
+        n = np.bincount(codigos[linhas], minlength=total).astype('float64')
+        sx, sy = somar(x, linhas), somar(y, linhas)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = somar(x * y, linhas) - sx * sy / n
+            vx = somar(x * x, linhas) - sx * sx / n
+            vy = somar(y * y, linhas) - sy * sy / n
+            correlacao[nota] = np.clip(cov / np.sqrt(vx * vy), -1, 1)
+    registros = np.bincount(codigos[validos_grupo], minlength=total)
+    return {
+        'correlacao': pd.DataFrame(correlacao, index=chaves),
+        'registros': pd.Series(registros, index=chaves, name='registros'),
+    }
+
+
+@medido()
+def correlacoes(df, grupos, notas, alvo):
+    chave = ('prescricao_correlacoes', tuple(grupos), tuple(notas), alvo)
+    return agregacao._memorizar(df, chave, lambda: _correlacoes(df, grupos, notas, alvo))
+
+
+def orcamentos(registros, total, divisao='igual'):
+    # Orçamento de cada grupo: partes iguais ou proporcionais ao número de registros
+    if divisao == 'registros' and registros.sum() > 0:
+        return total * registros / registros.sum()
+    return pd.Series(total / max(len(registros), 1), index=registros.index)
+
+
+def resolver(pesos, limites):
+    # Um único LP com os subproblemas de todos os grupos (blocos independentes), resolvido
+    # de uma vez pelo CBC. Recursos com peso não positivo ou desconhecido ficam em zero
+    # no ótimo e nem entram no modelo. O PuLP só é importado quando há o que resolver.
+    import pulp
+    problema = pulp.LpProblem('alocacao_por_grupo', pulp.LpMaximize)
+    valores = pesos.to_numpy(dtype='float64')
+    variaveis = {}
+    for i, j in zip(*np.nonzero(np.nan_to_num(valores, nan=0.0) > 0)):
+        variaveis[i, j] = pulp.LpVariable(f'r_{i}_{j}', lowBound=0)
+    problema += pulp.lpSum(valores[i, j] * v for (i, j), v in variaveis.items())
+    por_grupo = {}
+    for (i, j), v in variaveis.items():
+        por_grupo.setdefault(i, []).append(v)
+    for i, lista in por_grupo.items():
+        problema += pulp.lpSum(lista) <= float(limites.iloc[i]), f'orcamento_{i}'
+    problema.solve(pulp.PULP_CBC_CMD(msg=False))
+
+    alocacao = np.zeros_like(valores)
+    for (i, j), v in variaveis.items():
+        alocacao[i, j] = v.varValue or 0.0
+    return pulp.LpStatus[problema.status], pd.DataFrame(alocacao, index=pesos.index, columns=pesos.columns)
+
+
+@medido()
+def alocar(df, grupos, notas, alvo, impacto, total, divisao='igual'):
+    # Solução memorizada por (versão da base, grupos, notas, alvo, impacto, divisão, orçamento)
+    def calcular():
+        base = correlacoes(df, grupos, notas, alvo)
+        pesos = base['correlacao'] * impacto
+        limites = orcamentos(base['registros'], total, divisao)
+        status, alocacao = resolver(pesos, limites)
+        return {
+            'status': status,
+            'alocacao': alocacao,
+            'orcamento': limites,
+            'impacto': (alocacao * pesos.fillna(0)).sum(axis=1),
+            'correlacao': base['correlacao'],
+        }
+
+    chave = ('prescricao', tuple(grupos), tuple(notas), alvo, float(impacto), divisao, float(total))
+    return agregacao._memorizar(df, chave, calcular)
+
+
+def varrer(solucao, total, orcamentos_totais):
+    # Os orçamentos entram só no lado direito das restrições e mudam na mesma proporção:
+    # a base ótima continua ótima e a solução de cada valor é a de `total` reescalada,
+    # sem novas chamadas ao solver
+    linhas = []
+    for valor in orcamentos_totais:
+        fator = valor / total if total else 0.0
+        linhas.append({
+            'orcamento': valor,
+            'impacto': float(solucao['impacto'].sum() * fator),
+            **{nota: float(solucao['alocacao'][nota].sum() * fator) for nota in solucao['alocacao'].columns},
+        })
+    return pd.DataFrame(linhas)
+
+
+def tabela(solucao):
+    # Uma linha por grupo com o orçamento, os recursos de cada nota e o impacto esperado
+    resultado = pd.concat([
+        solucao['orcamento'].rename('orcamento'),
+        solucao['alocacao'].add_prefix('recurso_'),
+        solucao['correlacao'].add_prefix('correlacao_'),
+        solucao['impacto'].rename('impacto'),
+    ], axis=1)
+    return resultado.reset_index()
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from motor import agregacao
+from motor.externo import BaseExterna
+from motor.instrumentacao import medido
+
+
+@medido()
+def sankey(grupo, colunas, valor):
+    # Um nó por (nível, membro): o mesmo rótulo em níveis diferentes gera nós distintos
+    codigos, rotulos, deslocamento = [], [], 0
+    for coluna in colunas:
+        categorias = pd.Categorical(grupo[coluna]).remove_unused_categories()
+        codigos.append(categorias.codes.astype('int64') + deslocamento)
+        rotulos += categorias.categories.astype(str).to_list()
+        deslocamento += len(categorias.categories)
+
+    # Fluxos entre níveis consecutivos somados por par (origem, destino)
+    ligacoes = []
+    for i in range(len(colunas) - 1):
+        pares = pd.DataFrame({
+            'source': codigos[i],
+            'target': codigos[i + 1],
+            'value': grupo[valor].to_numpy(),
+        })
+        ligacoes.append(pares.groupby(['source', 'target'], sort=False)['value'].sum().reset_index())
+    ligacoes = pd.concat(ligacoes, ignore_index=True) if ligacoes else \
+        pd.DataFrame(columns=['source', 'target', 'value'])
+    ligacoes['label'] = ligacoes['value']
+    return rotulos, ligacoes
+
+
+@medido()
+def histograma(df, medidas, bins=50):
+    # Contagens por faixa calculadas no servidor, com as mesmas faixas para todas as medidas
+    if isinstance(df, BaseExterna):
+        return _histograma_externo(df, medidas, bins)
+    valores = [df[m].to_numpy(dtype='float64') for m in medidas]
+    valores = [v[~np.isnan(v)] for v in valores]
+    presentes = [v for v in valores if len(v)]
+    if not presentes:
+        return pd.DataFrame(columns=['medida', 'inicio', 'fim', 'centro', 'contagem'])
+    minimo = min(v.min() for v in presentes)
+    maximo = max(v.max() for v in presentes)
+    faixas = np.linspace(minimo, maximo if maximo > minimo else minimo + 1, bins + 1)
+    partes = []
+    for medida, v in zip(medidas, valores):
+        contagem, _ = np.histogram(v, bins=faixas)
+        partes.append(pd.DataFrame({
+            'medida': medida,
+            'inicio': faixas[:-1],
+            'fim': faixas[1:],
+            'centro': (faixas[:-1] + faixas[1:]) / 2,
+            'contagem': contagem,
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+def _histograma_externo(df, medidas, bins):
+    # Mesmas faixas do caminho em memória, com duas leituras em lotes da base
+    extremos = df.extremos(medidas)
+    if not extremos:
+        return pd.DataFrame(columns=['medida', 'inicio', 'fim', 'centro', 'contagem'])
+    minimo = min(e[0] for e in extremos.values())
+    maximo = max(e[1] for e in extremos.values())
+    faixas = np.linspace(minimo, maximo if maximo > minimo else minimo + 1, bins + 1)
+    contagens = df.histograma(medidas, faixas)
+    return pd.concat([
+        pd.DataFrame({
+            'medida': medida,
+            'inicio': faixas[:-1],
+            'fim': faixas[1:],
+            'centro': (faixas[:-1] + faixas[1:]) / 2,
+            'contagem': contagens[medida],
+        }) for medida in medidas
+    ], ignore_index=True)
+
+
+@medido()
+def amostrar(df, colunas, limite):
+    # Amostra aleatória simples: preserva a densidade dos pontos e limita o payload
+    if isinstance(df, BaseExterna):
+        return df.amostrar(list(dict.fromkeys(colunas)), limite)
+    base = df[list(dict.fromkeys(colunas))].dropna()
+    if len(base) > limite:
+        base = base.sample(n=limite, random_state=0)
+    return base
+
+
+@medido()
+def folhas(df, caminho, valor):
+    # Só as folhas da hierarquia (combinações distintas de caminho) vão para o Plotly
+    base = agregacao.agregar(df, caminho, valor).reset_index()
+    # O Plotly não consegue agregar a cor discreta de colunas categóricas
+    return base.astype({
+        c: 'object' for c in caminho if isinstance(base[c].dtype, pd.CategoricalDtype)
+    })
@@ -0,0 +1,167 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from motor import dados
+
+# Bases sintéticas com o mesmo esquema de load_database(), para testes de escala.
+# Os blocos são gerados e gravados um a um: a base inteira nunca fica em memória.
+
+UFS = [
+    ('AC', 'Acre', 'Norte'), ('AL', 'Alagoas', 'Nordeste'), ('AP', 'Amapá', 'Norte'),
+    ('AM', 'Amazonas', 'Norte'), ('BA', 'Bahia', 'Nordeste'), ('CE', 'Ceará', 'Nordeste'),
+    ('DF', 'Distrito Federal', 'Centro-Oeste'), ('ES', 'Espírito Santo', 'Sudeste'),
+    ('GO', 'Goiás', 'Centro-Oeste'), ('MA', 'Maranhão', 'Nordeste'), ('MT', 'Mato Grosso', 'Centro-Oeste'),
+    ('MS', 'Mato Grosso do Sul', 'Centro-Oeste'), ('MG', 'Minas Gerais', 'Sudeste'), ('PA', 'Pará', 'Norte'),
+    ('PB', 'Paraíba', 'Nordeste'), ('PR', 'Paraná', 'Sul'), ('PE', 'Pernambuco', 'Nordeste'),
+    ('PI', 'Piauí', 'Nordeste'), ('RJ', 'Rio de Janeiro', 'Sudeste'), ('RN', 'Rio Grande do Norte', 'Nordeste'),
+    ('RS', 'Rio Grande do Sul', 'Sul'), ('RO', 'Rondônia', 'Norte'), ('RR', 'Roraima', 'Norte'),
+    ('SC', 'Santa Catarina', 'Sul'), ('SP', 'São Paulo', 'Sudeste'), ('SE', 'Sergipe', 'Nordeste'),
+    ('TO', 'Tocantins', 'Norte'),
+]
+AMAZONIA_LEGAL = {'AC', 'AP', 'AM', 'MA', 'MT', 'PA', 'RO', 'RR', 'TO'}
+# Efeito médio de cada região sobre as notas (em desvios padrão)
+EFEITO_REGIAO = {'Norte': -0.5, 'Nordeste': -0.4, 'Centro-Oeste': 0.1, 'Sudeste': 0.4, 'Sul': 0.4}
+# O IDEB é bienal
+ANOS = list(range(2005, 2024, 2))
+REDES = ['estadual', 'federal', 'municipal', 'privada', 'publica']
+EFEITO_REDE = np.array([0.0, 1.2, -0.2, 1.0, -0.1])
+# Proporção de linhas de cada rede e chance de não haver Saeb (a maior parte das privadas não participa)
+PESO_REDE = np.array([0.3, 0.02, 0.45, 0.08, 0.15])
+SEM_SAEB_REDE = np.array([0.12, 0.1, 0.15, 0.9, 0.12])
+ENSINOS = ['fundamental', 'medio']
+ANOS_ESCOLARES = ['finais (6-9)', 'iniciais (1-5)', 'todos (1-4)']
+# Por etapa (iniciais, finais, médio): média e limites da escala Saeb de matemática e de português
+SAEB_MATEMATICA = np.array([[215.0, 60.0, 350.0], [255.0, 100.0, 400.0], [275.0, 111.0, 467.0]])
+SAEB_PORTUGUES = np.array([[200.0, 49.0, 324.0], [250.0, 100.0, 400.0], [270.0, 117.0, 451.0]])
+MUNICIPIOS = 5570
+TAMANHO_BLOCO = 500_000
+
+
+def municipios(semente=0):
+    # Um município por linha com toda a hierarquia territorial acima dele e o efeito
+    # do município sobre as notas. Cada recorte intermediário pertence a uma só UF.
+    gerador = np.random.default_rng([semente, 0])
+    uf = np.sort(gerador.integers(0, len(UFS), MUNICIPIOS))
+    sigla = np.array([u[0] for u in UFS])[uf]
+    regiao = np.array([u[2] for u in UFS])[uf]
+    meso = uf * 6 + gerador.integers(0, 6, MUNICIPIOS)
+    micro = meso * 4 + gerador.integers(0, 4, MUNICIPIOS)
+    intermediaria = uf * 5 + gerador.integers(0, 5, MUNICIPIOS)
+    imediata = intermediaria * 4 + gerador.integers(0, 4, MUNICIPIOS)
+    saude = imediata * 2 + gerador.integers(0, 2, MUNICIPIOS)
+    metropolitana = np.where(gerador.random(MUNICIPIOS) < 0.25, uf * 3 + gerador.integers(0, 3, MUNICIPIOS), -1)
+    territorio = pd.DataFrame({
+        'sigla_uf': sigla,
+        'id_municipio': 1_100_000 + np.arange(MUNICIPIOS),
+        'cidade': [f'Município {i:04d}' for i in range(MUNICIPIOS)],
+        'nome_regiao_saude': [f'Região de Saúde {i}' for i in saude],
+        'nome_regiao_imediata': [f'Região Imediata {i}' for i in imediata],
+        'nome_regiao_intermediaria': [f'Região Intermediária {i}' for i in intermediaria],
+        'nome_microrregiao': [f'Microrregião {i}' for i in micro],
+        'nome_mesorregiao': [f'Mesorregião {i}' for i in meso],
+        'nome_regiao_metropolitana': [f'Região Metropolitana {i}' if i >= 0 else None for i in metropolitana],
+        'nome_uf': np.array([u[1] for u in UFS])[uf],
+        'nome_regiao': regiao,
+        'amazonia_legal': np.isin(sigla, list(AMAZONIA_LEGAL)),
+    })
+    # Categorias fixas: todos os blocos compartilham os mesmos dicionários
+    for coluna in territorio.columns:
+        if coluna not in ('id_municipio', 'amazonia_legal'):
+            territorio[coluna] = territorio[coluna].astype('category')
+    efeito = np.vectorize(EFEITO_REGIAO.get)(regiao) + gerador.normal(0, 0.6, MUNICIPIOS)
+    return territorio, efeito
+
+
+def _bloco(territorio, efeito, ano, linhas, gerador):
+    municipio = gerador.integers(0, MUNICIPIOS, linhas)
+    rede = gerador.choice(len(REDES), linhas, p=PESO_REDE)
+    # Fundamental (anos iniciais ou finais) ou médio (todos)
+    etapa = gerador.choice(3, linhas, p=[0.4, 0.35, 0.25])
+    ensino = (etapa == 2).astype('int8')
+    anos_escolares = np.array([1, 0, 2], dtype='int8')[etapa]
+
+    # Nível latente da escola: município, rede, tendência ao longo das edições e ruído
+    z = efeito[municipio] + EFEITO_REDE[rede] + (ano - ANOS[0]) * 0.04 + gerador.normal(0, 0.6, linhas)
+    aprovacao = 1 / (1 + np.exp(-(2.3 + 0.6 * z + gerador.normal(0, 0.4, linhas))))
+    rendimento = np.clip(aprovacao - np.abs(gerador.normal(0, 0.02, linhas)), 0.3, 1.0)
+    matematica = SAEB_MATEMATICA[etapa, 0] + 22 * z + gerador.normal(0, 10, linhas)
+    portugues = SAEB_PORTUGUES[etapa, 0] + 20 * z + gerador.normal(0, 10, linhas)
+
+    def padronizar(nota, escala):
+        return np.clip((nota - escala[etapa, 1]) / (escala[etapa, 2] - escala[etapa, 1]), 0, 1) * 10
+
+    padronizada = (padronizar(matematica, SAEB_MATEMATICA) + padronizar(portugues, SAEB_PORTUGUES)) / 2
+    ideb = np.round(rendimento * padronizada, 1)
+
+    # Linhas sem Saeb ficam sem notas nem IDEB; algumas também sem taxa de aprovação
+    sem_saeb = gerador.random(linhas) < SEM_SAEB_REDE[rede]
+    for medida in (matematica, portugues, padronizada, ideb):
+        medida[sem_saeb] = np.nan
+    sem_taxa = gerador.random(linhas) < 0.03
+    aprovacao[sem_taxa] = np.nan
+    rendimento[sem_taxa] = np.nan
+    ideb[sem_taxa] = np.nan
+
+    df = territorio.iloc[municipio].reset_index(drop=True)
+    df.insert(0, 'ano', np.full(linhas, ano, dtype='int16'))
+    df.insert(3, 'rede', pd.Categorical.from_codes(rede, REDES))
+    df.insert(4, 'ensino', pd.Categorical.from_codes(ensino, ENSINOS))
+    df.insert(5, 'anos_escolares', pd.Categorical.from_codes(anos_escolares, ANOS_ESCOLARES))
+    df.insert(6, 'taxa_aprovacao', np.round(aprovacao * 100, 1))
+    df.insert(7, 'indicador_rendimento', rendimento)
+    df.insert(8, 'nota_saeb_matematica', matematica)
+    df.insert(9, 'nota_saeb_lingua_portuguesa', portugues)
+    df.insert(10, 'nota_saeb_media_padronizada', padronizada)
+    df.insert(11, 'ideb', ideb)
+    return dados.aplicar_tipos(df)
+
+
+def blocos(linhas, semente=0, anos=ANOS, tamanho_bloco=TAMANHO_BLOCO):
+    # Gera a base em blocos, ordenada por ano como as partições gravadas pela aplicação.
+    # O resultado depende só da semente e do tamanho do bloco.
+    territorio, efeito = municipios(semente)
+    por_ano = np.full(len(anos), linhas // len(anos))
+    por_ano[:linhas % len(anos)] += 1
+    for ano, total in zip(anos, por_ano):
+        for inicio in range(0, total, tamanho_bloco):
+            gerador = np.random.default_rng([semente, ano, inicio])
+            yield _bloco(territorio, efeito, ano, min(tamanho_bloco, total - inicio), gerador)
+
+
+def base(linhas, semente=0, anos=ANOS, tamanho_bloco=TAMANHO_BLOCO):
+    # Base inteira em memória, no formato de load_database()
+    df = pd.concat(list(blocos(linhas, semente, anos, tamanho_bloco)), ignore_index=True)
+    df.attrs['versao'] = f'sintetica-{linhas}-{semente}'
+    return df
+
+
+def gravar_parquet(caminho, linhas, semente=0, anos=ANOS, tamanho_bloco=TAMANHO_BLOCO):
+    # Um row group por bloco; o arquivo pode ser ingerido com `python -m motor.dados`
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    escritor = None
+    try:
+        for bloco in blocos(linhas, semente, anos, tamanho_bloco):
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho + '.tmp', tabela.schema, compression='zstd')
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    os.replace(caminho + '.tmp', caminho)
+
+
+if __name__ == '__main__':
+    # python -m motor.sintetico data/sintetica.parquet --linhas 20000000 --semente 1
+    parser = argparse.ArgumentParser(description='Gera uma base sintética com o esquema do IDEB')
+    parser.add_argument('caminho')
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+    gravar_parquet(args.caminho, args.linhas, args.semente, tamanho_bloco=args.bloco)
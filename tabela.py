@@ -1,31 +1,90 @@
 import streamlit as st
+from motor import exportacao, paginacao
+from motor.instrumentacao import exibir
+from motor.indice import indice_para
 
+
+@st.cache_resource(max_entries=2)
+def load_indices(_df, versao):
+    # Ordens das principais dimensões calculadas uma vez por versão da base
+    return paginacao.IndicesOrdenacao(_df)
+
+
+column_config = {
+    'ano': st.column_config.TextColumn(label='Ano'),
+    'sigla_uf': st.column_config.TextColumn(label='UF'),
+    'rede': st.column_config.TextColumn(label='Rede'),
+    'ensino': st.column_config.TextColumn(label='Ensino'),
+    'anos_escolares': st.column_config.TextColumn(label='Anos Escolares'),
+    'taxa_aprovacao': st.column_config.NumberColumn(label='Taxa de Aprovação'),
+    'indicador_rendimento': st.column_config.NumberColumn(label='Indicador de Rendimento'),
+    'nota_saeb_matematica': st.column_config.NumberColumn(label='Nota Saeb Matemática'),
+    'nota_saeb_lingua_portuguesa': st.column_config.NumberColumn(label='Nota Saeb Português'),
+    'nota_saeb_media_padronizada': st.column_config.NumberColumn(label='Nota Saeb Média Padronizada'),
+    'ideb': st.column_config.NumberColumn(label='Ideb'),
+    'cidade': st.column_config.TextColumn(label='Cidade'),
+    'nome_regiao_saude': st.column_config.TextColumn(label='Região de Saúde'),
+    'nome_regiao_imediata': st.column_config.TextColumn(label='Região Imediata'),
+    'nome_regiao_intermediaria': st.column_config.TextColumn(label='Região Intermediária'),
+    'nome_microrregiao': st.column_config.TextColumn(label='Microregião'),
+    'nome_mesorregiao': st.column_config.TextColumn(label='Mesorregião'),
+    'nome_regiao_metropolitana': st.column_config.TextColumn(label='Região Metropolitana'),
+    'nome_uf': st.column_config.TextColumn(label='Estado'),
+    'nome_regiao': st.column_config.TextColumn(label='Região'),
+    'amazonia_legal': st.column_config.TextColumn(label='Amazônia Legal')
+}
+
+df = st.session_state['df']
 st.title('Tabela')
-st.dataframe(
-    st.session_state['df'],
+
+cols = st.columns(4)
+colunas = cols[0].multiselect('Colunas', list(df.columns), default=list(df.columns))
+ordem = cols[1].selectbox('Ordenar por', [None] + list(df.columns))
+crescente = cols[2].toggle('Crescente', value=True)
+tamanho = cols[3].selectbox('Linhas por página', [50, 100, 500, 1000], index=1)
+
+filtros = {}
+with st.expander(label='Filtros', expanded=False):
+    cols = st.columns(len(paginacao.FILTRAVEIS))
+    for i, coluna in enumerate(paginacao.FILTRAVEIS):
+        selecionados = cols[i].multiselect(coluna, indice_para(df).membros(coluna))
+        if selecionados:
+            filtros[coluna] = selecionados
+
+linhas = paginacao.posicoes(
+    df, filtros, load_indices(df, df.attrs.get('versao')), ordem, crescente
+)
+paginas = max(1, -(-len(linhas) // tamanho))
+cols = st.columns([1, 3])
+numero = cols[0].number_input('Página', min_value=1, max_value=paginas, value=1)
+cols[1].text(f'{len(linhas)} linhas em {paginas} páginas')
+
+exibir(
+    'tabela.pagina', st.dataframe,
+    paginacao.pagina(df, linhas, numero, tamanho, colunas),
     hide_index=True,
     use_container_width=True,
-    column_config={
-        'ano': st.column_config.TextColumn(label='Ano'),
-        'sigla_uf': st.column_config.TextColumn(label='UF'),
-        'rede': st.column_config.TextColumn(label='Rede'),
-        'ensino': st.column_config.TextColumn(label='Ensino'),
-        'anos_escolares': st.column_config.TextColumn(label='Anos Escolares'),
-        'taxa_aprovacao': st.column_config.NumberColumn(label='Taxa de Aprovação'),
-        'indicador_rendimento': st.column_config.NumberColumn(label='Indicador de Rendimento'),
-        'nota_saeb_matematica': st.column_config.NumberColumn(label='Nota Saeb Matemática'),
-        'nota_saeb_lingua_portuguesa': st.column_config.NumberColumn(label='Nota Saeb Português'),
-        'nota_saeb_media_padronizada': st.column_config.NumberColumn(label='Nota Saeb Média Padronizada'),
-        'ideb': st.column_config.NumberColumn(label='Ideb'),
-        'cidade': st.column_config.TextColumn(label='Cidade'),
-        'nome_regiao_saude': st.column_config.TextColumn(label='Região de Saúde'),
-        'nome_regiao_imediata': st.column_config.TextColumn(label='Região Imediata'),
-        'nome_regiao_intermediaria': st.column_config.TextColumn(label='Região Intermediária'),
-        'nome_microrregiao': st.column_config.TextColumn(label='Microregião'),
-        'nome_mesorregiao': st.column_config.TextColumn(label='Mesorregião'),
-        'nome_regiao_metropolitana': st.column_config.TextColumn(label='Região Metropolitana'),
-        'nome_uf': st.column_config.TextColumn(label='Estado'),
-        'nome_regiao': st.column_config.TextColumn(label='Região'),
-        'amazonia_legal': st.column_config.TextColumn(label='Amazônia Legal')
-    }
-)
\ No newline at end of file
+    column_config=column_config
+)
+
+# Exportação completa: em fluxo pela API quando configurada; senão montada em memória
+# só quando o botão é clicado, até o limite de linhas
+cols = st.columns(3)
+saida = cols[0].selectbox('Formato', list(exportacao.FORMATOS))
+compactar = cols[1].toggle('Compactar (gzip)', value=True, disabled=saida != 'csv') and saida == 'csv'
+if exportacao.API:
+    cols[2].link_button(
+        'Exportar', exportacao.endereco(exportacao.API, filtros, colunas, saida, compactar, ordem, crescente)
+    )
+else:
+    grande = len(linhas) > exportacao.LIMITE_LINHAS_MEMORIA
+    cols[2].download_button(
+        'Exportar', lambda: exportacao.exportar(exportacao.blocos(df, linhas, colunas), saida, compactar),
+        file_name=exportacao.nome_arquivo('ideb', saida, compactar), mime=exportacao.mime(saida, compactar),
+        disabled=grande
+    )
+    if grande:
+        st.caption(
+            f'Recortes acima de {exportacao.LIMITE_LINHAS_MEMORIA} linhas são exportados em fluxo pela API '
+            '(python -m motor.api e IDEB_API com o endereço dela): filtre a tabela ou configure a API.'
+        )
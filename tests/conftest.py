@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from motor import sintetico
+
+
+@pytest.fixture
+def pasta_base(tmp_path, monkeypatch):
+    # Pasta de trabalho da aplicação com uma base sintética pequena em data/ideb.xlsx
+    os.makedirs(tmp_path / 'data')
+    sintetico.base(600).to_excel(tmp_path / 'data' / 'ideb.xlsx', index=False)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
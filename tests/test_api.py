@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import pytest
+from starlette.datastructures import QueryParams
+
+from motor import api
+
+
+class Requisicao:
+    method = 'GET'
+
+    def __init__(self, consulta):
+        self.query_params = QueryParams(consulta)
+
+
+def _chamar(funcao, consulta):
+    resposta = asyncio.run(api._responder(funcao)(Requisicao(consulta)))
+    return resposta.status_code, json.loads(resposta.body)
+
+
+def test_filtro_de_medida_encontra_o_valor_gravado(pasta_base):
+    df, _ = api.base()
+    valor = df['ideb'].dropna().iloc[0]
+    status, corpo = _chamar(api.agregar, f'grupos=sigla_uf&medida=ideb&agregador=count&filtro=ideb:{valor}')
+    assert status == 200
+    assert sum(linha[1] for linha in corpo['dados']) == int((df['ideb'] == valor).sum()) > 0
+
+
+@pytest.mark.parametrize('filtro', ['ideb:abc', 'ano:20x9', 'sigla_uf:,', 'sigla_uf:', ':SP'])
+def test_filtro_invalido_responde_400(pasta_base, filtro):
+    status, corpo = _chamar(api.agregar, f'grupos=sigla_uf&medida=ideb&filtro={filtro}')
+    assert status == 400
+    assert 'erro' in corpo
+
+
+def test_serie_de_membro_booleano(pasta_base):
+    status, corpo = _chamar(api.serie, 'coluna=amazonia_legal&medida=ideb&membro=true')
+    assert status == 200
+    assert [linha[0] for linha in corpo['valores']['dados']] == [True]
@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+import pytest
+
+from motor import dados, esquema, sintetico
+
+
+def _comparavel(df):
+    # Categorias de cada leitura são diferentes; compara os valores
+    df = df.sort_values(['ano', 'id_municipio', 'rede', 'ensino', 'anos_escolares'], kind='stable')
+    return df.astype({c: object for c in esquema.categoricas() if c in df.columns}).reset_index(drop=True)
+
+
+def _igual(obtido, esperado):
+    pd.testing.assert_frame_equal(_comparavel(obtido), _comparavel(esperado))
+
+
+@pytest.fixture
+def edicao(pasta_base):
+    # Edição nova (2025) com um município que não existe na base
+    df = sintetico.base(200, semente=1, anos=[2025])
+    df['cidade'] = df['cidade'].cat.add_categories(['Zzz Nova']).astype(object)
+    df.loc[:9, 'cidade'] = 'Zzz Nova'
+    caminho = os.path.join('data', 'ideb_2025.parquet')
+    df.to_parquet(caminho)
+    return caminho
+
+
+def test_carregar_igual_ao_xlsx(pasta_base):
+    df = dados.carregar_ideb()
+    _igual(df, dados._ler_origem(dados.ARQUIVO_XLSX))
+    for coluna in esquema.categoricas():
+        if coluna in df.columns:
+            assert isinstance(df[coluna].dtype, pd.CategoricalDtype)
+            assert list(df[coluna].cat.categories) == sorted(df[coluna].cat.categories)
+
+
+def test_ingerir_acrescenta_so_a_edicao_nova(pasta_base, edicao):
+    antes = dados.carregar_ideb()
+    particoes = dados._ler_manifesto(dados.PASTA_CACHE)['particoes']
+
+    versao = dados.ingerir_edicao(edicao)
+    depois = dados.carregar_ideb()
+    manifesto = dados._ler_manifesto(dados.PASTA_CACHE)
+    assert versao == depois.attrs['versao'] != antes.attrs['versao']
+    assert depois.attrs['versao_anterior'] == antes.attrs['versao']
+    assert depois.attrs['anos_novos'] == [2025]
+    # As partições dos anos anteriores não foram regravadas
+    assert {ano: p for ano, p in manifesto['particoes'].items() if ano != '2025'} == particoes
+
+    _igual(depois, pd.concat([dados._ler_origem(dados.ARQUIVO_XLSX), dados._ler_origem(edicao)]))
+    assert 'Zzz Nova' in depois['cidade'].cat.categories
+    assert list(depois['cidade'].cat.categories) == manifesto['categorias']['cidade'] == \
+        sorted(manifesto['categorias']['cidade'])
+
+
+def test_ingerir_substitui_edicao_existente(pasta_base):
+    antes = dados.carregar_ideb()
+    nova = sintetico.base(100, semente=2, anos=[2023])
+    nova.to_parquet(os.path.join('data', 'ideb_2023.parquet'))
+    dados.ingerir_edicao(os.path.join('data', 'ideb_2023.parquet'))
+    depois = dados.carregar_ideb()
+    assert depois.attrs['anos_novos'] == [2023]
+    _igual(depois, pd.concat([antes[antes['ano'] != 2023], nova]))
+    assert len(os.listdir(os.path.join(dados.PASTA_CACHE, dados.PASTA_PARTICOES))) == len(sintetico.ANOS)
+
+
+def test_manifesto_sem_categorias_carrega_igual(pasta_base, edicao):
+    # Manifesto gravado antes dos dicionários unificados
+    dados.carregar_ideb()
+    dados.ingerir_edicao(edicao)
+    esperado = dados.carregar_ideb()
+    manifesto = dados._ler_manifesto(dados.PASTA_CACHE)
+    del manifesto['categorias']
+    dados._gravar_manifesto(dados.PASTA_CACHE, manifesto)
+    pd.testing.assert_frame_equal(dados.carregar_ideb(), esperado)
+
+
+def test_cache_de_arquivo_unico_e_convertido(pasta_base):
+    # Formato anterior: um único feather e um manifesto sem partições
+    os.makedirs(dados.PASTA_CACHE)
+    dados._ler_origem(dados.ARQUIVO_XLSX).to_feather(os.path.join(dados.PASTA_CACHE, 'ideb-antigo.feather'))
+    dados._gravar_manifesto(dados.PASTA_CACHE, {'hash': dados._hash_arquivo(dados.ARQUIVO_XLSX)})
+    df = dados.carregar_ideb()
+    _igual(df, dados._ler_origem(dados.ARQUIVO_XLSX))
+    assert not os.path.exists(os.path.join(dados.PASTA_CACHE, 'ideb-antigo.feather'))
+    assert 'categorias' in dados._ler_manifesto(dados.PASTA_CACHE)
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from motor import estatistica, sintetico
+
+multicomp = pytest.importorskip('statsmodels.stats.multicomp')
+
+
+@pytest.fixture(scope='module')
+def df():
+    return sintetico.base(5000)
+
+
+def _statsmodels(df, coluna, medida, ano, alpha):
+    recorte = df[df['ano'] == ano].dropna(subset=[medida])
+    teste = multicomp.pairwise_tukeyhsd(recorte[medida].astype('float64'), recorte[coluna].astype(str), alpha)
+    grupos = teste.groupsunique
+    i, j = np.triu_indices(len(grupos), 1)
+    return pd.DataFrame({
+        'grupo1': grupos[i], 'grupo2': grupos[j], 'reject': teste.reject, 'meandiffs': teste.meandiffs,
+    })
+
+
+@pytest.mark.parametrize('coluna, alpha', [('nome_regiao', 0.05), ('nome_regiao', 0.01), ('rede', 0.05), ('sigla_uf', 0.05)])
+def test_tukey_igual_ao_pairwise_tukeyhsd(df, coluna, alpha):
+    tabela, pares, rejeitados = estatistica.tukey(df, coluna, 'ideb', 2021, alpha, apenas_rejeitados=False)
+    esperado = _statsmodels(df, coluna, 'ideb', 2021, alpha)
+    tabela = tabela.astype({'grupo1': str, 'grupo2': str})
+    pd.testing.assert_frame_equal(tabela, esperado, check_dtype=False)
+    assert pares == len(esperado)
+    assert rejeitados == esperado['reject'].sum()
+
+
+def test_tukey_so_rejeitados_e_limite(df):
+    esperado = _statsmodels(df, 'sigla_uf', 'ideb', 2021, 0.05)
+    esperado = esperado[esperado['reject']].reset_index(drop=True)
+    tabela, pares, rejeitados = estatistica.tukey(df, 'sigla_uf', 'ideb', 2021)
+    pd.testing.assert_frame_equal(tabela.astype({'grupo1': str, 'grupo2': str}), esperado, check_dtype=False)
+    assert rejeitados == len(esperado) > 3
+
+    # Acima do limite ficam os pares mais distantes, mas os totais não mudam
+    recortada, pares_recortada, rejeitados_recortada = estatistica.tukey(df, 'sigla_uf', 'ideb', 2021, limite=3)
+    assert len(recortada) == 3 and recortada['reject'].all()
+    assert (pares_recortada, rejeitados_recortada) == (pares, rejeitados)
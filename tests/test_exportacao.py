@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import io
+from urllib.parse import urlsplit
+
+import pandas as pd
+import pytest
+from starlette.datastructures import QueryParams
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from motor import api, exportacao, paginacao
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'ano': [2019, 2019, 2021, 2021, 2023],
+        'sigla_uf': pd.Categorical(['SP', 'RJ', 'SP', 'RJ', 'SP']),
+        'ideb': [5.1, None, 5.4, 4.9, 5.6],
+    })
+
+
+def _baixar(gerar):
+    # O que o st.download_button faz com o valor devolvido pela função passada em data
+    return convert_data_to_bytes_and_infer_mime(gerar(), TypeError('tipo não aceito pelo download_button'))[0]
+
+
+def _ler(dados, formato):
+    if formato == 'csv':
+        return pd.read_csv(io.BytesIO(dados))
+    if formato == 'parquet':
+        return pd.read_parquet(io.BytesIO(dados))
+    return pd.read_excel(io.BytesIO(dados))
+
+
+@pytest.mark.parametrize('formato', list(exportacao.FORMATOS))
+def test_download_button_aceita_exportacao(df, formato):
+    # Mesma chamada das páginas tabela.py e cubo.py, em blocos menores que a base
+    dados = _baixar(lambda: exportacao.exportar(exportacao.blocos(df, tamanho=2), formato))
+    lido = _ler(dados, formato)
+    assert lido['ideb'].tolist() == pytest.approx(df['ideb'].tolist(), nan_ok=True)
+    assert lido['sigla_uf'].astype(str).tolist() == df['sigla_uf'].astype(str).tolist()
+
+
+def test_download_button_aceita_csv_compactado(df):
+    linhas = [0, 2, 4]
+    dados = _baixar(lambda: exportacao.exportar(exportacao.blocos(df, linhas, ['ano', 'ideb'], tamanho=2), 'csv', True))
+    lido = pd.read_csv(io.BytesIO(gzip.decompress(dados)))
+    pd.testing.assert_frame_equal(lido, df.iloc[linhas][['ano', 'ideb']].reset_index(drop=True))
+
+
+def test_download_button_aceita_recorte_vazio(df):
+    dados = _baixar(lambda: exportacao.exportar(exportacao.blocos(df, [], ['ano', 'ideb']), 'csv'))
+    assert dados.decode('utf-8').strip() == 'ano,ideb'
+
+
+def test_rota_da_api_exporta_o_recorte_da_tabela(pasta_base):
+    # O link da tabela (IDEB_API) gera em fluxo o mesmo arquivo que o download em memória
+    df, _ = api.base()
+    filtros, colunas = {'rede': ['municipal', 'estadual'], 'ano': [2019, 2021]}, ['ano', 'rede', 'cidade', 'ideb']
+    endereco = exportacao.endereco('http://api:8000/', filtros, colunas, 'csv', True, 'cidade', False)
+    assert endereco.startswith('http://api:8000/exportar?')
+
+    class Requisicao:
+        query_params = QueryParams(urlsplit(endereco).query)
+
+    async def ler(resposta):
+        return b''.join([parte async for parte in resposta.body_iterator])
+
+    resposta = api.exportar(Requisicao(), None)
+    linhas = paginacao.posicoes(df, filtros, paginacao.IndicesOrdenacao(df), 'cidade', False)
+    esperado = exportacao.exportar(exportacao.blocos(df, linhas, colunas), 'csv', True)
+    assert gzip.decompress(asyncio.run(ler(resposta))) == gzip.decompress(esperado)
+    assert len(linhas) > 0
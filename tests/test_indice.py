@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from motor import agregacao, indice, sintetico
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = sintetico.base(5000)
+    # Membros nulos nunca passam num filtro
+    df.loc[::7, 'rede'] = None
+    df.attrs['versao'] = 'teste'
+    return df
+
+
+def _mascara(df, filtros):
+    selecionadas = np.ones(len(df), dtype=bool)
+    for coluna, valores in filtros.items():
+        selecionadas &= df[coluna].isin(valores).to_numpy()
+    return np.flatnonzero(selecionadas)
+
+
+FILTROS = [
+    {'rede': ['municipal']},
+    {'rede': ['municipal', 'estadual'], 'ano': [2019, 2021]},
+    {'sigla_uf': ['SP', 'MG', 'BA'], 'ensino': ['fundamental'], 'amazonia_legal': [False]},
+    {'ano': [2023], 'anos_escolares': ['iniciais (1-5)', 'finais (6-9)'], 'rede': ['estadual']},
+    {'sigla_uf': ['XX']},
+    {'rede': [], 'ano': [2019]},
+    {'ano': [2019, 1900], 'rede': ['municipal', 'inexistente']},
+]
+
+
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_linhas_iguais_a_mascara(df, filtros):
+    assert indice.IndiceDimensoes(df).linhas(filtros).tolist() == _mascara(df, filtros).tolist()
+
+
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_agregacao_usa_indice_com_mesmo_resultado(df, filtros):
+    assert indice.indice_para(df) is not None
+    assert agregacao.linhas(df, filtros).tolist() == _mascara(df, filtros).tolist()
+    assert agregacao.mascara(df, filtros).tolist() == np.isin(np.arange(len(df)), _mascara(df, filtros)).tolist()
+
+
+def test_coluna_fora_do_indice_filtra_pela_mascara(df):
+    filtros = {'rede': ['municipal'], 'id_municipio': df['id_municipio'].iloc[:50].tolist()}
+    assert agregacao.linhas(df, filtros).tolist() == _mascara(df, filtros).tolist()
+
+
+def test_membros_presentes_em_ordem(df):
+    assert indice.IndiceDimensoes(df).membros('rede') == sorted(df['rede'].dropna().unique().tolist())
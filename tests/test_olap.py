@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from motor import olap, sintetico
+
+AGREGADORES = ['sum', 'count', 'min', 'max', 'mean']
+
+
+@pytest.fixture(scope='module')
+def df():
+    return sintetico.base(5000)
+
+
+@pytest.fixture(scope='module')
+def cubo(df):
+    return olap.Cubo(df, ['ideb', 'nota_saeb_matematica'])
+
+
+@pytest.mark.parametrize('agregador', AGREGADORES)
+@pytest.mark.parametrize('grupos', [
+    ['nome_regiao'], ['sigla_uf', 'rede', 'ano'], ['cidade', 'ensino'], ['anos_escolares', 'ano'], ['amazonia_legal'],
+])
+def test_consulta_igual_ao_groupby(df, cubo, grupos, agregador):
+    # Do cuboide menor (roll-up dos parciais) ou, fora do reticulado, direto da base
+    esperado = df['ideb'].astype('float64').groupby([df[g] for g in grupos], observed=True).agg(agregador)
+    obtido = cubo.consultar(grupos, 'ideb', agregador)
+    pd.testing.assert_series_equal(
+        obtido.sort_index(), esperado.sort_index(), check_dtype=False, check_names=False, check_index_type=False,
+    )
+
+
+@pytest.mark.parametrize('agregador', AGREGADORES)
+def test_pivot_igual_ao_pivot_table(df, cubo, agregador):
+    esperado = pd.pivot_table(
+        df.astype({'nota_saeb_matematica': 'float64'}), index=['nome_regiao', 'rede'], columns='ano',
+        values='nota_saeb_matematica', aggfunc=agregador, fill_value=0, observed=True,
+    )
+    obtido = cubo.pivotar(['nome_regiao', 'rede'], ['ano'], 'nota_saeb_matematica', agregador)
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False, check_names=False, check_index_type=False)
+
+
+def test_agregador_nao_decomponivel(cubo):
+    with pytest.raises(ValueError):
+        cubo.consultar(['rede'], 'ideb', 'median')
+
+
+def test_acrescentar_igual_a_reconstruir(df):
+    # Cubo estendido com a última edição e cubo construído do zero sobre a base inteira
+    ultimo = df['ano'].max()
+    anterior = olap.Cubo(df[df['ano'] < ultimo].reset_index(drop=True), ['ideb'])
+    estendido = anterior.acrescentar(df, [ultimo])
+    completo = olap.Cubo(df, ['ideb'])
+    for grupos in (['sigla_uf', 'ano'], ['nome_regiao', 'rede'], ['cidade']):
+        for agregador in AGREGADORES:
+            pd.testing.assert_series_equal(
+                estendido.consultar(grupos, 'ideb', agregador).sort_index(),
+                completo.consultar(grupos, 'ideb', agregador).sort_index(),
+            )
@@ -0,0 +1,28 @@
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from motor import modelos
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def test_modelo_treina_pela_pagina(pasta_base):
+    # Sob o Streamlit o __main__ é o app.py: os processos do pool não podem executá-lo
+    modelos.resultados.limpar()
+    modelos.erros.limpar()
+    sessao = AppTest.from_file(APP, default_timeout=120)
+    sessao.run()
+    sessao.switch_page('visualizacao/preditiva.py').run()
+    sessao.selectbox[0].set_value('ano').run()
+    sessao.multiselect[0].set_value(['id_municipio']).run()
+    assert not sessao.exception
+
+    limite = time.time() + 120
+    while modelos.pendentes(list(modelos._tarefas)) and time.time() < limite:
+        time.sleep(0.2)
+    sessao.run()
+
+    assert not [erro.value for erro in sessao.error]
+    assert any('MSE' in texto.value for texto in sessao.markdown)
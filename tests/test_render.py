@@ -0,0 +1,29 @@
+import pytest
+
+from motor import render, sintetico
+
+
+@pytest.fixture(scope='module')
+def df():
+    return sintetico.base(3000)
+
+
+@pytest.mark.parametrize('colunas', [['nome_regiao', 'rede'], ['rede', 'ensino', 'anos_escolares'], ['ensino']])
+def test_sankey_soma_cada_par_de_niveis(df, colunas):
+    rotulos, ligacoes = render.sankey(df, colunas, 'ideb')
+    niveis = [sorted(df[c].astype(str).unique()) for c in colunas]
+    assert rotulos == [r for nivel in niveis for r in nivel]
+
+    # Nó de cada (nível, membro) e fluxos esperados por um groupby simples entre níveis vizinhos
+    no = {}
+    for i, nivel in enumerate(niveis):
+        for membro in nivel:
+            no[i, membro] = len(no)
+    esperado = {}
+    for i in range(len(colunas) - 1):
+        somas = df.astype({colunas[i]: str, colunas[i + 1]: str}).groupby(colunas[i:i + 2])['ideb'].sum()
+        for (origem, destino), valor in somas.items():
+            esperado[no[i, origem], no[i + 1, destino]] = valor
+    obtido = {(o, d): v for o, d, v in ligacoes[['source', 'target', 'value']].itertuples(index=False)}
+    assert obtido == pytest.approx(esperado)
+    assert ligacoes['label'].tolist() == ligacoes['value'].tolist()
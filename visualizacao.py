@@ -1,5 +1,7 @@
 import streamlit as st
 import plotly.express as px
+from motor import agregacao, render
+from motor.instrumentacao import exibir
 
 cols = st.columns(3)
 meds = cols[0].multiselect(
@@ -12,48 +14,68 @@ st.text('Visualização')
 if len(meds) > 0:
     if len(meds) >= 1:
         st.subheader('Distribuição - Histograma')
-        st.plotly_chart(
-            px.histogram(st.session_state['df'], x=meds)
+        exibir(
+            'visualizacao.histograma', st.plotly_chart,
+            px.bar(
+                render.histograma(st.session_state['df'], meds),
+                x='centro', y='contagem', color='medida', barmode='overlay',
+                labels={'centro': 'value', 'contagem': 'count', 'medida': 'variable'}
+            ).update_layout(bargap=0)
         )
     if len(meds) >= 2:
         st.subheader('Relacionamento - Pontos/Dispersão')
-        st.plotly_chart(
+        exibir(
+            'visualizacao.dispersao', st.plotly_chart,
             px.scatter(
-                st.session_state['df'], x=meds[0], y=meds[1]
+                render.amostrar(
+                    st.session_state['df'], meds[:2],
+                    st.session_state['limite_pontos']
+                ),
+                x=meds[0], y=meds[1]
             )
         )
     if len(meds) == 3:
         st.subheader('Relacionamento - Bolhas')
         try:
-            st.plotly_chart(
-                px.scatter(st.session_state['df'],
+            exibir(
+                'visualizacao.bolhas', st.plotly_chart,
+                px.scatter(
+                    render.amostrar(
+                        st.session_state['df'], meds[:3],
+                        st.session_state['limite_pontos']
+                    ),
                     x=meds[0], y=meds[1], size=meds[2]
                 )
             )
         except:
             st.text('Não pode haver valores negativos')
-    gr = st.session_state['df'].groupby(dims)[
-        meds[0]].sum().reset_index()
+    gr = agregacao.agregar(
+        st.session_state['df'], dims, meds[0]).reset_index()
     with st.expander(label='mostrar tabela', expanded=False):
-        st.dataframe(
+        exibir(
+            'visualizacao.tabela', st.dataframe,
             gr, hide_index=True, use_container_width=True
         )
-    st.plotly_chart(
+    exibir(
+        'visualizacao.pizza', st.plotly_chart,
         px.pie(gr, names=dims, values=meds[0], hole=0.5))
-    gr = st.session_state['df'].groupby(
-        [time] + [dims])[meds[0]].sum().reset_index()
+    gr = agregacao.agregar(
+        st.session_state['df'], [time] + [dims], meds[0]).reset_index()
     with st.expander(label='Mostrar Tabela', expanded=False):
-        st.dataframe(
+        exibir(
+            'visualizacao.tabela_tempo', st.dataframe,
             gr, hide_index=True, use_container_width=True
         )
     if len(gr[time].unique()) <= 6:
         if len(gr[dims].unique()) <= 6:
-            st.plotly_chart(
+            exibir(
+                'visualizacao.barras', st.plotly_chart,
                 px.bar(
                     data_frame=gr, x=str(time),
                     y=meds[0], color=dims))
         else:
-            st.plotly_chart(
+            exibir(
+                'visualizacao.area', st.plotly_chart,
                 px.area(
                     data_frame=gr,
                     x=str(time),
@@ -62,7 +84,8 @@ if len(meds) > 0:
                 )
             )
     else:
-        st.plotly_chart(
+        exibir(
+            'visualizacao.linha', st.plotly_chart,
             px.line(
                 data_frame=gr,
                 x=str(time),
@@ -1,7 +1,8 @@
-import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
+from motor import agregacao, render
+from motor.instrumentacao import exibir
 
 # Seleção das dimensões, medidas e dimensão temporal
 cols = st.columns(3)
@@ -29,10 +30,13 @@ tabs = st.tabs(['Treemap', 'Sunburst', 'Sankey', 'TimeSeries'])
 
 # Verifica se há colunas suficientes para gerar os gráficos hierárquicos
 if len(colunas) > 2:
+    # Folhas já agregadas no servidor: o payload não cresce com o número de linhas
+    hierarquia = render.folhas(st.session_state['df'], colunas, valor)
+
     # Treemap
     with tabs[0]:
         fig = px.treemap(
-            st.session_state['df'],
+            hierarquia,
             path=colunas,
             values=valor,
             color=cor,
@@ -40,12 +44,12 @@ if len(colunas) > 2:
             width=1200
         )
         fig.update_traces(textinfo='label+value')
-        st.plotly_chart(fig)
+        exibir('descritiva.treemap', st.plotly_chart, fig)
 
     # Sunburst
     with tabs[1]:
         fig = px.sunburst(
-            st.session_state['df'],
+            hierarquia,
             path=colunas,
             values=valor,
             color=cor,
@@ -53,38 +57,17 @@ if len(colunas) > 2:
             width=1200
         )
         fig.update_traces(textinfo='label+value')
-        st.plotly_chart(fig)
+        exibir('descritiva.sunburst', st.plotly_chart, fig)
 
     # Sankey
-    grupo = st.session_state['df'].groupby(colunas)[valor].sum().reset_index().copy()
-    rotulos, codigo = [], 0
-    for coluna in colunas:
-        for conteudo in grupo[coluna].unique():
-            rotulos.insert(len(rotulos), [codigo, conteudo])
-            codigo += 1
-    rotulos = pd.DataFrame(rotulos, columns=['codigo', 'conteudo'])
-    rotulos['codigo'] = rotulos['codigo'].astype(int)
-
-    sankey = []
-    for i in range(0, len(colunas) - 1):
-        for index, row in grupo.iterrows():
-            sankey.insert(
-                len(sankey),
-                [
-                    rotulos[rotulos['conteudo'] == row[colunas[i]]]['codigo'].values[0],
-                    rotulos[rotulos['conteudo'] == row[colunas[i + 1]]]['codigo'].values[0],
-                    row[valor],
-                    row[valor]
-                ]
-            )
-
-    sankey = pd.DataFrame(sankey, columns=['source', 'target', 'value', 'label'])
+    grupo = agregacao.agregar(st.session_state['df'], colunas, valor).reset_index()
+    rotulos, sankey = render.sankey(grupo, colunas, valor)
     data_trace = dict(
         type='sankey', domain=dict(x=[0, 1], y=[0, 1]),
         orientation="h",
         valueformat=".2f",
         node=dict(pad=10, thickness=30, line=dict(color="black", width=0.5),
-                  label=rotulos['conteudo'].to_list()
+                  label=rotulos
                   ),
         link=dict(
             source=sankey['source'].dropna(axis=0, how='any'),
@@ -101,20 +84,22 @@ if len(colunas) > 2:
     )
     fig = go.Figure(dict(data=[data_trace], layout=layout))
     with tabs[2]:
-        st.plotly_chart(fig)
+        exibir('descritiva.sankey', st.plotly_chart, fig)
 
 # Série Temporal (Time Series)
 with tabs[3]:
     # Seleciona dados para a série temporal, usando a dimensão de tempo selecionada
-    base = st.session_state['df'].pivot_table(
-        index=dimensao_tempo,  # Dimensão de tempo (ex: 'ano', 'mês')
-        columns=colunas,  # Dimensões selecionadas
-        values=valor,  # Medida selecionada
-        aggfunc='sum'  # Função de agregação
+    base = agregacao.pivotar(
+        st.session_state['df'],
+        dimensao_tempo,  # Dimensão de tempo (ex: 'ano', 'mês')
+        colunas,  # Dimensões selecionadas
+        valor,  # Medida selecionada
+        'sum'  # Função de agregação
     ).reset_index()
 
     # Cria o gráfico de série temporal
-    st.plotly_chart(
+    exibir(
+        'descritiva.serie', st.plotly_chart,
         px.line(
             base,
             x=dimensao_tempo,  # Eixo X será a dimensão temporal (ano, mês, etc.)
@@ -1,13 +1,8 @@
 import pandas as pd
 import streamlit as st
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression, LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.metrics import accuracy_score, mean_squared_error
-from sklearn.preprocessing import LabelEncoder
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
 import plotly.express as px
+from motor import modelos, render
+from motor.instrumentacao import exibir
 
 # Configurações de layout da página
 st.title("Análise Preditiva: Modelos Supervisionados e Não Supervisionados")
@@ -15,16 +10,6 @@ st.title("Análise Preditiva: Modelos Supervisionados e Não Supervisionados")
 df = st.session_state['df']  # Carrega o dataframe da sessão
 
 
-# Função para transformar colunas categóricas em numéricas
-def encode_features(df, features):
-    df_encoded = df.copy()
-    for col in features:
-        if df_encoded[col].dtype == 'object':  # Verifica se a coluna é categórica
-            encoder = LabelEncoder()
-            df_encoded[col] = encoder.fit_transform(df_encoded[col])
-    return df_encoded
-
-
 # Seleção de colunas para modelagem
 st.subheader("Seleção de Variáveis")
 
@@ -34,13 +19,29 @@ features = st.multiselect("Selecione as variáveis preditoras (features)", df.co
 
 if target and features:
     # Certifica que as features e o target são numéricos
-    df_encoded = encode_features(df, features + [target])
+    df_encoded = modelos.codificar(df, features + [target])
 
     X = df_encoded[features]
     y = df_encoded[target]
 
-    # Divisão dos dados em treino e teste
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+    # Os treinos rodam num pool de processos e ficam em cache por
+    # (versão da base, alvo, variáveis, hiperparâmetros): mexer num slider
+    # só treina o modelo afetado e nunca bloqueia a sessão
+    versao = df.attrs.get('versao')
+    progresso = st.empty()
+    tarefas = []
+
+    def mostrar(identificador):
+        # Resultado do modelo, ou aviso enquanto o treino não termina
+        tarefas.append(identificador)
+        try:
+            resultado = modelos.resultado(identificador)
+        except Exception as erro:
+            st.error(f"Falha no treino: {erro}")
+            return None
+        if resultado is None:
+            st.info("Treinando em segundo plano...")
+        return resultado
 
     # -------------------- Modelos Supervisionados --------------------
 
@@ -49,40 +50,34 @@ if target and features:
     # 1. Regressão Linear
     st.subheader("Regressão Linear")
 
-    if y_train.dtype in [int, float]:  # Verifica se a variável alvo é contínua
-        model_linear = LinearRegression()
-        model_linear.fit(X_train, y_train)
-        y_pred_linear = model_linear.predict(X_test)
-        mse_linear = mean_squared_error(y_test, y_pred_linear)
-        st.write(f"Erro Quadrático Médio (MSE): {mse_linear}")
+    if y.dtype.kind in 'if':  # Verifica se a variável alvo é contínua
+        linear = mostrar(modelos.solicitar('linear', versao, target, features, {}, X, y))
+        if linear is not None:
+            st.write(f"Erro Quadrático Médio (MSE): {linear['mse']}")
 
-        # Gráfico Regressão Linear
-        fig_linear = px.scatter(x=y_test, y=y_pred_linear, labels={'x': 'Valores Reais', 'y': 'Valores Previstos'},
-                                title="Regressão Linear: Valores Reais vs Previsão")
-        st.plotly_chart(fig_linear)
+            # Gráfico Regressão Linear
+            fig_linear = px.scatter(x=linear['real'], y=linear['previsto'], labels={'x': 'Valores Reais', 'y': 'Valores Previstos'},
+                                    title="Regressão Linear: Valores Reais vs Previsão")
+            exibir('preditiva.linear', st.plotly_chart, fig_linear)
 
     # 2. Regressão Logística
     st.subheader("Regressão Logística")
 
-    if y_train.nunique() == 2:  # Verifica se é uma classificação binária
-        model_logistic = LogisticRegression(max_iter=1000)
-        model_logistic.fit(X_train, y_train)
-        y_pred_logistic = model_logistic.predict(X_test)
-        precision_logistic = accuracy_score(y_test, y_pred_logistic)
-        st.write(f"Precisão: {precision_logistic}")
-        st.write("Valores reais vs previsões")
-        st.write(pd.DataFrame({'Real': y_test, 'Previsão': y_pred_logistic}))
+    if y.nunique() == 2:  # Verifica se é uma classificação binária
+        logistica = mostrar(modelos.solicitar('logistica', versao, target, features, {'max_iter': 1000}, X, y))
+        if logistica is not None:
+            st.write(f"Precisão: {logistica['precisao']}")
+            st.write("Valores reais vs previsões")
+            st.write(pd.DataFrame({'Real': logistica['real'], 'Previsão': logistica['previsto']}))
 
     # 3. Árvore de Decisão
     st.subheader("Árvore de Decisão")
 
-    model_tree = DecisionTreeClassifier(random_state=42)
-    model_tree.fit(X_train, y_train)
-    y_pred_tree = model_tree.predict(X_test)
-    precision_tree = accuracy_score(y_test, y_pred_tree)
-    st.write(f"Precisão: {precision_tree}")
-    st.write("Valores reais vs previsões")
-    st.write(pd.DataFrame({'Real': y_test, 'Previsão': y_pred_tree}))
+    arvore = mostrar(modelos.solicitar('arvore', versao, target, features, {'random_state': 42}, X, y))
+    if arvore is not None:
+        st.write(f"Precisão: {arvore['precisao']}")
+        st.write("Valores reais vs previsões")
+        st.write(pd.DataFrame({'Real': arvore['real'], 'Previsão': arvore['previsto']}))
 
     # -------------------- Modelos Não Supervisionados --------------------
 
@@ -93,16 +88,48 @@ if target and features:
 
     # Número de clusters para KMeans
     n_clusters = st.slider('Número de Clusters (K)', 2, 10, 3)
-    model_kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    cluster_labels = model_kmeans.fit_predict(X)
-
-    st.write(f"Soma dos Quadrados das Distâncias aos Centróides: {model_kmeans.inertia_}")
-
-    # Adiciona os clusters ao DataFrame original para visualização
-    df_encoded['Cluster'] = cluster_labels
-    fig_kmeans = px.scatter_matrix(df_encoded, dimensions=features, color='Cluster',
-                                   title=f"KMeans com {n_clusters} Clusters")
-    st.plotly_chart(fig_kmeans)
+    # Acima de 100 mil linhas o padrão é o modo escalável
+    escalavel = st.toggle('Modo escalável (mini-batch)', value=len(X) > 100_000)
+    if escalavel:
+        # Varredura do cotovelo: um treino por K em paralelo, cada um no cache,
+        # de modo que o slider só consulta resultados já prontos
+        parametros = {'random_state': 42, 'n_init': 3, 'batch_size': 4096}
+        varredura = {
+            k: modelos.solicitar('kmeans_lote', versao, None, features, {**parametros, 'n_clusters': k}, X)
+            for k in range(2, 11)
+        }
+        kmeans = mostrar(varredura[n_clusters])
+        inercias = []
+        for k, identificador in varredura.items():
+            if k != n_clusters:
+                tarefas.append(identificador)
+            try:
+                resultado = modelos.resultado(identificador)
+            except Exception:
+                # O erro do K escolhido já aparece em mostrar(); os demais ficam fora da curva
+                continue
+            if resultado is not None:
+                inercias.append([k, resultado['inercia']])
+        if inercias:
+            exibir(
+                'preditiva.cotovelo', st.plotly_chart,
+                px.line(pd.DataFrame(inercias, columns=['K', 'Inércia']), x='K', y='Inércia',
+                        markers=True, title="Método do Cotovelo")
+            )
+    else:
+        kmeans = mostrar(modelos.solicitar(
+            'kmeans', versao, None, features, {'n_clusters': n_clusters, 'random_state': 42}, X
+        ))
+    if kmeans is not None:
+        st.write(f"Soma dos Quadrados das Distâncias aos Centróides: {kmeans['inercia']}")
+
+        # Adiciona os clusters ao DataFrame original para visualização (amostrado)
+        df_encoded['Cluster'] = kmeans['rotulos']
+        fig_kmeans = px.scatter_matrix(
+            render.amostrar(df_encoded, features + ['Cluster'], st.session_state['limite_pontos']),
+            dimensions=features, color='Cluster', title=f"KMeans com {n_clusters} Clusters"
+        )
+        exibir('preditiva.kmeans', st.plotly_chart, fig_kmeans)
 
     # 2. PCA (Análise de Componentes Principais)
     st.subheader("PCA (Análise de Componentes Principais)")
@@ -114,17 +141,33 @@ if target and features:
         if max_components > 2:
             # Número de componentes para PCA
             n_components = st.slider('Número de Componentes (PCA)', 2, max_components, 2)
-            model_pca = PCA(n_components=n_components)
-            X_pca = model_pca.fit_transform(X)
-
-            st.write(f"Proporção de variância explicada por componente: {model_pca.explained_variance_ratio_}")
-            st.write(f"Variância explicada acumulada: {model_pca.explained_variance_ratio_.cumsum()}")
-
-            # DataFrame com componentes principais
-            pca_df = pd.DataFrame(X_pca, columns=[f'PC{i + 1}' for i in range(n_components)])
-            fig_pca = px.scatter(pca_df, x='PC1', y='PC2', title="PCA - Componentes Principais")
-            st.plotly_chart(fig_pca)
+            pca = mostrar(modelos.solicitar(
+                'pca', versao, None, features, {'n_components': n_components}, X
+            ))
+            if pca is not None:
+                st.write(f"Proporção de variância explicada por componente: {pca['variancia']}")
+                st.write(f"Variância explicada acumulada: {pca['variancia'].cumsum()}")
+
+                # DataFrame com componentes principais
+                pca_df = pd.DataFrame(pca['componentes'], columns=[f'PC{i + 1}' for i in range(n_components)])
+                fig_pca = px.scatter(pca_df, x='PC1', y='PC2', title="PCA - Componentes Principais")
+                exibir('preditiva.pca', st.plotly_chart, fig_pca)
         else:
             st.warning("O número de componentes PCA deve ser maior que 2.")
     else:
         st.warning("PCA requer mais de uma feature. Selecione ao menos duas variáveis.")
+
+    # Progresso dos treinos em segundo plano
+    pendentes = modelos.pendentes(tarefas)
+    progresso.progress(
+        1 - len(pendentes) / len(tarefas),
+        text=f"Modelos prontos: {len(tarefas) - len(pendentes)}/{len(tarefas)}"
+    )
+
+    @st.fragment(run_every=1 if pendentes else None)
+    def acompanhar_treino():
+        # Recarrega a página quando os treinos pendentes terminam
+        if pendentes and not modelos.pendentes(pendentes):
+            st.rerun()
+
+    acompanhar_treino()
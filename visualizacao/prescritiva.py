@@ -1,6 +1,7 @@
 import pandas as pd
 import streamlit as st
-import pulp
+from motor import prescricao
+from motor.instrumentacao import exibir, medir
 
 # Carregar o DataFrame já presente no st.session_state
 df = st.session_state['df']
@@ -46,7 +47,7 @@ if notas_fundamental_medio and nota_superior:
     # Criando a correlação entre as notas do Ensino Fundamental/Médio e a nota do Ensino Superior
     correlacao = df_filtered.corr()[nota_superior].sort_values(ascending=False)
     st.write("Correlação das notas do Ensino Fundamental e Médio com a Nota do Ensino Superior:")
-    st.dataframe(correlacao)
+    exibir('prescritiva.correlacao', st.dataframe, correlacao)
 
     st.write("""
     As notas com maior correlação positiva indicam quais disciplinas ou áreas do Ensino Fundamental e Médio mais influenciam no 
@@ -64,43 +65,51 @@ if notas_fundamental_medio and nota_superior:
     # Limite de orçamento para melhorar as áreas com maior impacto
     orcamento = st.number_input("Orçamento Disponível (R$)", min_value=0.0, value=50000.0)
 
-    # Definir pesos com base na correlação
-    pesos = {col: correlacao[col] * impacto_recursos_fundamental_medio for col in notas_fundamental_medio}
-
-    # Modelo de otimização
-    if st.button("Resolver Otimização"):
-        # Criando o problema de otimização
-        problema = pulp.LpProblem("Maximização_Notas_Ensino_Superior", pulp.LpMaximize)
-
-        # Variáveis de decisão: Alocação de recursos para cada nota
-        alocacao_recursos = {col: pulp.LpVariable(f"Recursos_{col}", lowBound=0, cat='Continuous') for col in
-                             notas_fundamental_medio}
-
-        # Função objetivo: Maximizar a nota do Ensino Superior com base nas correlações
-        problema += pulp.lpSum(
-            [pesos[col] * alocacao_recursos[col] for col in notas_fundamental_medio]), "Função Objetivo"
-
-        # Restrição de orçamento
-        problema += pulp.lpSum(alocacao_recursos.values()) <= orcamento, "Restrição de Orçamento"
-
-        # Resolvendo o problema
-        problema.solve()
-
-        # Resultados
-        st.subheader("Resultados da Otimização")
-
-        if problema.status == pulp.LpStatusOptimal:
-            st.success("Solução Ótima Encontrada!")
-            st.write("Recursos alocados para melhorar as notas do Ensino Fundamental e Médio:")
-            for col in notas_fundamental_medio:
-                st.write(f"{col}: R$ {alocacao_recursos[col].varValue:.2f}")
+    # Nível da alocação: o país inteiro ou um orçamento por região, UF ou município
+    nivel = st.selectbox(
+        "Alocar Recursos por",
+        [prescricao.ROTULO_BRASIL, 'nome_regiao', 'nome_uf', 'cidade']
+    )
+    grupos = [] if nivel == prescricao.ROTULO_BRASIL else [nivel]
+    divisao = st.radio(
+        "Divisão do Orçamento entre os Grupos", list(prescricao.DIVISOES), horizontal=True,
+        disabled=not grupos
+    )
 
-            st.write(
-                f"Orçamento total utilizado: R$ {sum([alocacao_recursos[col].varValue for col in notas_fundamental_medio]):.2f}")
-        else:
-            st.error("Não foi possível encontrar uma solução ótima.")
+    # Modelo de otimização: todos os grupos num único problema, memorizado por versão da base
+    with medir('prescritiva.resolver'):
+        solucao = prescricao.alocar(
+            df, grupos, notas_fundamental_medio, nota_superior,
+            impacto_recursos_fundamental_medio, orcamento, prescricao.DIVISOES[divisao]
+        )
+
+    # Resultados
+    st.subheader("Resultados da Otimização")
+
+    if solucao['status'] == 'Optimal':
+        st.success("Solução Ótima Encontrada!")
+        st.write("Recursos alocados para melhorar as notas do Ensino Fundamental e Médio:")
+        for col in notas_fundamental_medio:
+            st.write(f"{col}: R$ {solucao['alocacao'][col].sum():.2f}")
+
+        st.write(f"Orçamento total utilizado: R$ {solucao['alocacao'].to_numpy().sum():.2f}")
+
+        if grupos:
+            st.write("Alocação por grupo (clique no cabeçalho para ordenar):")
+            exibir(
+                'prescritiva.alocacao', st.dataframe, prescricao.tabela(solucao),
+                hide_index=True, use_container_width=True
+            )
+
+        if orcamento > 0:
+            # Cenários de orçamento a partir da mesma solução
+            st.write("Cenários de Orçamento:")
+            cenarios = prescricao.varrer(solucao, orcamento, [orcamento * f for f in (0.25, 0.5, 1, 1.5, 2)])
+            exibir('prescritiva.cenarios', st.dataframe, cenarios, hide_index=True)
+    else:
+        st.error("Não foi possível encontrar uma solução ótima.")
 
     # Exibe o status da solução
-    st.write(f"Status da Solução: {pulp.LpStatus[problema.status]}")
+    st.write(f"Status da Solução: {solucao['status']}")
 else:
     st.error("Por favor, selecione as notas do Ensino Fundamental, Médio e Superior.")